@@ -6,9 +6,43 @@ Natural language Excel/CSV editor with structured command execution
 import streamlit as st
 import pandas as pd
 import io
+import os
+import re
+import asyncio
+import hashlib
+import importlib.util
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from llm_helper import LLMHelper
-from executor import Executor
+from functools import partial
+from typing import TYPE_CHECKING, Dict, Optional
+from executor import Executor, normalize_plan, plan_batches
+
+# History and session slots share frames by reference; copy-on-write keeps
+# that safe and makes derived frames (rename, drop, column selections) lazy
+pd.options.mode.copy_on_write = True
+
+if TYPE_CHECKING:
+    from llm_helper import LLMHelper
+
+try:
+    from audio_transcriber import get_transcriber
+except ImportError:
+    get_transcriber = None
+
+# Fastest installed Excel engines: calamine (Rust) reads xlsx and xls, xlsxwriter
+# writes; both are optional and fall back to openpyxl
+EXCEL_READ_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else None
+EXCEL_WRITE_ENGINE = 'xlsxwriter' if importlib.util.find_spec('xlsxwriter') else 'openpyxl'
+
+# Identical prompts on unchanged data within this many seconds are treated as double submits
+DUPLICATE_REQUEST_WINDOW = 30
+
+# Chat messages kept (and redrawn on every rerun); older ones are dropped
+MAX_CHAT_HISTORY = 200
 
 # Page config
 st.set_page_config(
@@ -19,7 +53,10 @@ st.set_page_config(
 )
 
 # Custom CSS - Dark Theme (matching BNC project)
-st.markdown("""
+@st.cache_data(show_spinner=False)
+def _load_css() -> str:
+    """Build the static CSS block once per process instead of on every rerun"""
+    css = """
 <style>
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
     
@@ -389,7 +426,177 @@ st.markdown("""
         border: 1px solid rgba(255, 255, 255, 0.1);
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+    # Minified, since the block is re-sent to the browser on every rerun:
+    # drop comments, collapse whitespace, trim it around { } ; , >
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    return re.sub(r'\s*([{};,>])\s*', r'\1', css).strip()
+
+# Re-emitted each rerun (Streamlit drops elements that aren't redrawn), but the
+# payload itself comes from the cache
+st.markdown(_load_css(), unsafe_allow_html=True)
+
+# Shared resources (one instance per process, not per rerun)
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_llm_helper(api_key: str, provider: str, model: str) -> "LLMHelper":
+    """Create the LLM client once per (api_key, provider, model)"""
+    # Imported on first use: sessions without an API key never load the SDK stack
+    from llm_helper import LLMHelper
+    return LLMHelper(api_key=api_key, provider=provider, model=model)
+
+@st.cache_resource(show_spinner=False)
+def get_audio_transcriber():
+    """Load the speech-to-text transcriber once per process"""
+    if get_transcriber is None:
+        raise ImportError("audio_transcriber is not available")
+    return get_transcriber()
+
+@st.cache_resource(show_spinner=False)
+def warm_up_transcriber() -> Optional[threading.Thread]:
+    """Start loading the Whisper model in the background (once per process)"""
+    if get_transcriber is None:
+        return None
+    thread = threading.Thread(target=lambda: get_audio_transcriber().preload(), daemon=True)
+    thread.start()
+    return thread
+
+# Model is resident by the time the user records a voice command
+warm_up_transcriber()
+
+# Upload parsing (cached on the file's bytes, so reruns and re-uploads of the
+# same file skip the parse)
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_csv(data: bytes) -> pd.DataFrame:
+    """Parse an uploaded CSV file"""
+    return pd.read_csv(io.BytesIO(data), engine='pyarrow')  # multi-threaded Arrow parser
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_excel(data: bytes) -> Dict[str, pd.DataFrame]:
+    """Parse every sheet of an uploaded Excel workbook, in workbook order"""
+    excel_file = pd.ExcelFile(io.BytesIO(data), engine=EXCEL_READ_ENGINE)
+    sheet_names = excel_file.sheet_names
+    workers = min(8, len(sheet_names), os.cpu_count() or 1)
+    
+    # Sheets are independent, so fan them out. Only with calamine: it opens
+    # workbooks lazily, while openpyxl would re-load the whole file per thread
+    if EXCEL_READ_ENGINE == 'calamine' and workers > 1:
+        def read_sheet(sheet_name: str) -> pd.DataFrame:
+            # ExcelFile handles aren't thread-safe; each worker opens its own
+            return pd.read_excel(io.BytesIO(data), sheet_name=sheet_name, engine=EXCEL_READ_ENGINE)
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(sheet_names, pool.map(read_sheet, sheet_names)))
+    
+    return {
+        sheet_name: pd.read_excel(excel_file, sheet_name=sheet_name)
+        for sheet_name in sheet_names
+    }
+
+# Download payload builders (passed to st.download_button as callables so
+# they only run when the user clicks, not on every rerun). Results are
+# cached on cache_key (upload id + executor versions), so repeat downloads
+# of an unchanged sheet skip serialization; the executors aren't hashed
+@st.cache_data(show_spinner=False, max_entries=4)
+def build_csv_bytes(_executor: Executor, cache_key: tuple) -> bytes:
+    """Serialize an executor's current DataFrame to UTF-8 CSV bytes"""
+    # Write bytes straight into the buffer (no intermediate str + encode copy)
+    buffer = io.BytesIO()
+    _executor.get_dataframe().to_csv(buffer, index=False, encoding='utf-8')
+    return buffer.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def build_xlsx_bytes(_executors: Dict[str, Executor], cache_key: tuple) -> bytes:
+    """Serialize every sheet's current DataFrame into one XLSX workbook"""
+    buffer = io.BytesIO()
+    # xlsxwriter streams XML far faster than openpyxl's object tree. Its
+    # constant_memory mode is not usable: pandas writes cells column by
+    # column and that mode flushes (and drops) anything not row-ordered
+    engine_kwargs = {'options': {'strings_to_urls': False}} if EXCEL_WRITE_ENGINE == 'xlsxwriter' else {}
+    with pd.ExcelWriter(buffer, engine=EXCEL_WRITE_ENGINE, engine_kwargs=engine_kwargs) as writer:
+        for sheet_name in _executors:
+            # Get latest DataFrame from executor
+            _executors[sheet_name].get_dataframe().to_excel(writer, index=False, sheet_name=sheet_name)
+    return buffer.getvalue()
+
+def render_chat_message(msg: dict) -> None:
+    """Render one chat history entry in its own chat_message container"""
+    role = msg["role"]
+    content = msg["content"]
+    timestamp = msg.get("timestamp", "")
+    
+    with st.chat_message(role):
+        if role == "user":
+            st.markdown(f"**You** ({timestamp}):\n\n> {content}")
+            return
+        
+        # Show command if present
+        if "command" not in msg:
+            st.markdown(f"**AI** ({timestamp}):\n\n{content}")
+            return
+        
+        cmd = msg["command"]
+        action = cmd.get("action", "")
+        
+        if action == "insight":
+            st.markdown(f"**AI** ({timestamp}):")
+            st.info(msg["response"])
+        elif action == "error":
+            st.markdown(f"**AI** ({timestamp}):")
+            st.error(f"{cmd.get('error', 'Unknown error')}")
+        else:
+            st.markdown(f"**AI** ({timestamp}):\n\n**Command:** `{action}`")
+            if "reasoning" in cmd:
+                st.caption(cmd["reasoning"])
+            
+            # Show result
+            if msg.get("status") == "success":
+                st.success(f"{msg.get('message', 'Success')}")
+            elif msg.get("status") == "insight":
+                st.info(msg["response"])
+            else:
+                st.error(f"{msg.get('message', 'Failed')}")
+
+@st.fragment
+def render_voice_input() -> None:
+    """Voice recorder and transcript, rerun on its own so recording doesn't redraw the editor"""
+    col1, col2 = st.columns([1, 5])
+    
+    with col1:
+        st.markdown("**Voice Input**")
+        audio_bytes = st.audio_input("Record your query")
+    
+    with col2:
+        st.caption("Tap to start recording, tap again to stop. Text will appear in the chat box below.")
+    
+    # Process voice input, once per recording: audio_input keeps returning
+    # the same clip on later reruns until the user records or clears it
+    if audio_bytes is not None and audio_bytes.file_id != st.session_state.get("voice_clip_id"):
+        st.session_state.voice_clip_id = audio_bytes.file_id
+        with st.spinner("Transcribing..."):
+            try:
+                transcriber = get_audio_transcriber()
+                result = transcriber.transcribe(audio_bytes)
+                
+                if result["success"]:
+                    st.session_state.voice_transcript = result["text"]
+                    st.success(f"Transcribed! ({result['duration']:.1f}s)")
+                    st.info(f"**Transcript:** {result['text']}")
+                else:
+                    st.error(result["error"])
+                    st.session_state.voice_transcript = None
+                    
+            except ImportError:
+                st.error("Speech-to-text not available. Install: `pip install faster-whisper`")
+                st.session_state.voice_transcript = None
+            except Exception as e:
+                st.error(f"Transcription error: {str(e)}")
+                st.session_state.voice_transcript = None
+    
+    # If there's a pending transcript, display it for copy/paste
+    if st.session_state.voice_transcript:
+        st.markdown("**Copy Message:**")
+        st.code(st.session_state.voice_transcript, language=None)
 
 # Initialize session state
 if 'uploaded_df' not in st.session_state:
@@ -397,7 +604,7 @@ if 'uploaded_df' not in st.session_state:
 if 'executor' not in st.session_state:
     st.session_state.executor = None
 if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = deque(maxlen=MAX_CHAT_HISTORY)
 if 'llm_helper' not in st.session_state:
     st.session_state.llm_helper = None
 if 'file_name' not in st.session_state:
@@ -411,6 +618,8 @@ if 'sheet_names' not in st.session_state:
     st.session_state.sheet_names = []
 if 'active_sheet' not in st.session_state:
     st.session_state.active_sheet = None
+if 'upload_id' not in st.session_state:
+    st.session_state.upload_id = uuid.uuid4().hex
 
 # Sidebar - API Configuration (copied from BNC)
 with st.sidebar:
@@ -441,13 +650,8 @@ with st.sidebar:
     
     if api_key:
         try:
-            if 'llm_helper' not in st.session_state or st.session_state.llm_helper is None:
-                st.session_state.llm_helper = LLMHelper(
-                    api_key=api_key, 
-                    provider=provider.lower(), 
-                    model=model
-                )
-                st.success(f"{provider} API Connected")
+            st.session_state.llm_helper = get_llm_helper(api_key, provider.lower(), model)
+            st.success(f"{provider} API Connected")
         except Exception as e:
             st.error(f"Connection failed: {str(e)}")
     
@@ -464,13 +668,15 @@ with st.sidebar:
         if st.button("Clear & Upload New"):
             st.session_state.uploaded_df = None
             st.session_state.executor = None
-            st.session_state.chat_history = []
+            st.session_state.chat_history.clear()
             st.session_state.file_name = None
             # Multi-sheet support
             st.session_state.sheets = {}
             st.session_state.executors = {}
             st.session_state.sheet_names = []
             st.session_state.active_sheet = None
+            # A repeat prompt on the next file is a new request, not a double submit
+            st.session_state.pop("last_request", None)
             st.rerun()
 
 
@@ -490,34 +696,29 @@ if st.session_state.uploaded_df is None:
     
     if uploaded_file is not None:
         try:
-            # Read file
+            # Read file (parsed frames are cached on the file's bytes)
             if uploaded_file.name.endswith('.csv'):
                 # CSV: single sheet
-                df = pd.read_csv(uploaded_file)
+                df = load_csv(uploaded_file.getvalue())
                 st.session_state.sheets = {"Sheet1": df}
                 st.session_state.executors = {"Sheet1": Executor(df)}
                 st.session_state.sheet_names = ["Sheet1"]
                 st.session_state.active_sheet = "Sheet1"
             else:
                 # Excel: potentially multiple sheets
-                excel_file = pd.ExcelFile(uploaded_file)
-                sheets = {}
-                executors = {}
-                
-                for sheet_name in excel_file.sheet_names:
-                    df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                    sheets[sheet_name] = df
-                    executors[sheet_name] = Executor(df)
+                sheets = load_excel(uploaded_file.getvalue())
                 
                 st.session_state.sheets = sheets
-                st.session_state.executors = executors
-                st.session_state.sheet_names = excel_file.sheet_names
-                st.session_state.active_sheet = excel_file.sheet_names[0]
+                st.session_state.executors = {name: Executor(sheet_df) for name, sheet_df in sheets.items()}
+                st.session_state.sheet_names = list(sheets)
+                st.session_state.active_sheet = st.session_state.sheet_names[0]
             
             # Backward compatibility: point to active sheet
             st.session_state.uploaded_df = st.session_state.sheets[st.session_state.active_sheet]
             st.session_state.executor = st.session_state.executors[st.session_state.active_sheet]
             st.session_state.file_name = uploaded_file.name
+            # Distinguishes this upload in the shared download cache
+            st.session_state.upload_id = uuid.uuid4().hex
             
             # Success message
             total_sheets = len(st.session_state.sheet_names)
@@ -586,15 +787,17 @@ else:
         key="data_editor"
     )
     
-    # Detect if user made manual edits
-    if not edited_df.equals(df):
-        # User edited the data manually
-        st.session_state.executor.df = edited_df.copy()
-        st.session_state.executor.df_history.append(edited_df.copy())
+    # Detect if user made manual edits (the editor's delta is O(#edits), unlike
+    # a full-frame equals(); it resets once the edited frame is fed back in)
+    editor_state = st.session_state.get("data_editor", {})
+    if editor_state.get("edited_rows") or editor_state.get("added_rows") or editor_state.get("deleted_rows"):
+        # User edited the data manually. data_editor already returned a fresh
+        # frame and operations never mutate in place, so share one reference
+        st.session_state.executor.replace_dataframe(edited_df)
         
         # Sync to sheets dict
-        st.session_state.sheets[st.session_state.active_sheet] = edited_df.copy()
-        st.session_state.uploaded_df = edited_df.copy()
+        st.session_state.sheets[st.session_state.active_sheet] = edited_df
+        st.session_state.uploaded_df = edited_df
         
         st.success("Manual edits saved! Use Undo button to revert if needed.")
         st.rerun()
@@ -606,37 +809,7 @@ else:
     
     # Display chat history
     for msg in st.session_state.chat_history:
-        role = msg["role"]
-        content = msg["content"]
-        timestamp = msg.get("timestamp", "")
-        
-        if role == "user":
-            st.markdown(f"**You** ({timestamp}):")
-            st.markdown(f"> {content}")
-        else:
-            st.markdown(f"**AI** ({timestamp}):")
-            
-            # Show command if present
-            if "command" in msg:
-                cmd = msg["command"]
-                action = cmd.get("action", "")
-                
-                if action == "insight":
-                    st.info(msg["response"])
-                elif action == "error":
-                    st.error(f"{cmd.get('error', 'Unknown error')}")
-                else:
-                    st.markdown(f"**Command:** `{action}`")
-                    if "reasoning" in cmd:
-                        st.caption(cmd["reasoning"])
-                    
-                    # Show result
-                    if msg.get("status") == "success":
-                        st.success(f"{msg.get('message', 'Success')}")
-                    else:
-                        st.error(f"{msg.get('message', 'Failed')}")
-            else:
-                st.markdown(content)
+        render_chat_message(msg)
     
     # Voice Input Section (above chat input)
     st.markdown("---")
@@ -645,176 +818,178 @@ else:
     if 'voice_transcript' not in st.session_state:
         st.session_state.voice_transcript = None
     
-    col1, col2 = st.columns([1, 5])
-    
-    with col1:
-        st.markdown("**Voice Input**")
-        audio_bytes = st.audio_input("Record your query")
-    
-    with col2:
-        st.caption("Tap to start recording, tap again to stop. Text will appear in the chat box below.")
-    
-    # Process voice input
-    if audio_bytes is not None:
-        with st.spinner("Transcribing..."):
-            try:
-                from audio_transcriber import get_transcriber
-                
-                transcriber = get_transcriber()
-                result = transcriber.transcribe(audio_bytes)
-                
-                if result["success"]:
-                    st.session_state.voice_transcript = result["text"]
-                    st.success(f"Transcribed! ({result['duration']:.1f}s)")
-                    st.info(f"**Transcript:** {result['text']}")
-                else:
-                    st.error(result["error"])
-                    st.session_state.voice_transcript = None
-                    
-            except ImportError:
-                st.error("Speech-to-text not available. Install: `pip install faster-whisper`")
-                st.session_state.voice_transcript = None
-            except Exception as e:
-                st.error(f"Transcription error: {str(e)}")
-                st.session_state.voice_transcript = None
-    
-    # If there's a pending transcript, display it for copy/paste
-    if st.session_state.voice_transcript:
-        st.markdown("**Copy Message:**")
-        st.code(st.session_state.voice_transcript, language=None)
+    render_voice_input()
     
     # Chat input
     user_input = st.chat_input("Ask a question or give a command...")
     
     if user_input:
+        # Same prompt against the same sheet version of the same upload -> same answer
+        request_key = hashlib.blake2b(
+            f"{user_input}|{st.session_state.upload_id}|{st.session_state.active_sheet}|"
+            f"{st.session_state.executor.version}".encode(),
+            digest_size=16
+        ).hexdigest()
+        last_key, last_time = st.session_state.get("last_request", (None, 0.0))
+        
         # Check API key
         if not api_key or 'llm_helper' not in st.session_state or st.session_state.llm_helper is None:
             st.error(f"Please enter your {provider} API key in the sidebar")
+        elif request_key == last_key and time.monotonic() - last_time < DUPLICATE_REQUEST_WINDOW:
+            # Double submit: the previous answer is already in the chat above
+            st.info("Same request as a moment ago on unchanged data - see the answer above")
         else:
+            # Messages produced by this submit; added to the history in one go
+            # at the end, followed by a single rerun
+            pending = []
+            
             # Add user message
             timestamp = datetime.now().strftime("%H:%M:%S")
-            st.session_state.chat_history.append({
+            pending.append({
                 "role": "user",
                 "content": user_input,
                 "timestamp": timestamp
             })
             
-            # Get DataFrame context
-            df_context = {
-                "columns": list(df.columns),
-                "shape": df.shape,
-                "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
-                "preview": df.head(3).to_dict(orient='records')
-            }
+            # Get DataFrame context (memoized on the executor until the frame changes)
+            df_context = st.session_state.executor.get_context()
             
-            # Generate command
+            # Generate command (streamed, so partial output shows while the model is still writing)
             with st.spinner("Generating command..."):
-                command = st.session_state.llm_helper.generate_command(
+                stream_placeholder = st.empty()
+                command = st.session_state.llm_helper.stream_command(
                     user_input,
                     df_context,
-                    conversation_history=st.session_state.chat_history[:-1]
+                    conversation_history=st.session_state.chat_history,
+                    on_token=lambda text: stream_placeholder.code(text, language="json")
                 )
+                stream_placeholder.empty()
             
+            # Track execution results
+            all_results = []
             
-            # Debug: validate response type
-            if not isinstance(command, (dict, list)):
-                st.error(f"LLM returned unexpected type: {type(command)}")
-                st.error(f"Content: {command}")
-                st.session_state.chat_history.append({
+            # Normalize to array and validate in one pass (first problem wins)
+            commands, plan_error = normalize_plan(command)
+            if plan_error:
+                pending.append({
                     "role": "assistant",
-                    "content": f"Error: LLM returned {type(command)} instead of dict or list",
+                    "content": f"Error: {plan_error}",
                     "status": "error",
                     "timestamp": datetime.now().strftime("%H:%M:%S")
                 })
-                st.rerun()
+                all_results.append({"status": "error", "message": plan_error})
+                commands = []  # Nothing to execute
             
-            # Normalize to array for processing
-            commands = command if isinstance(command, list) else [command]
-            
-            # Validate each command has action field
-            for cmd in commands:
-                if not isinstance(cmd, dict) or "action" not in cmd:
-                    st.error(f"Command missing 'action' field")
-                    st.error(f"Received: {cmd}")
-                    st.session_state.chat_history.append({
-                        "role": "assistant",
-                        "content": f"Error: Command missing 'action' field. Got: {cmd}",
-                        "status": "error",
-                        "timestamp": datetime.now().strftime("%H:%M:%S")
-                    })
-                    st.rerun()
-            
-            # Track execution results
-            all_results = []
-            
-            # Execute each command
-            for idx, cmd in enumerate(commands):
-                step_num = f"Step {idx+1}/{len(commands)}: " if len(commands) > 1 else ""
-                
-                if cmd.get("action") == "insight":
-                    # Handle insight questions
-                    response = cmd.get("response", "I don't have enough information to answer that.")
-                    
-                    st.session_state.chat_history.append({
-                        "role": "assistant",
-                        "content": response,
-                        "command": cmd,
-                        "response": response,
-                        "status": "insight",
-                        "timestamp": datetime.now().strftime("%H:%M:%S")
-                    })
-                    all_results.append({"status": "insight", "message": response})
-                    
+            # Execute each command. Runs of read-only steps (insights, aggregations)
+            # leave the DataFrame untouched, so they are executed side by side
+            idx = 0
+            success_count = 0
+            total_commands = len(commands)
+            stop = False
+            for batch in plan_batches(commands):
+                if len(batch) > 1:
+                    batch_results = asyncio.run(st.session_state.executor.execute_concurrently(batch))
                 else:
-                    # Execute operation
-                    result = st.session_state.executor.execute(cmd)
-                    
-                    # Update message with step number
-                    message = step_num + result.get("message", "")
+                    batch_results = [st.session_state.executor.execute(batch[0])]
+                
+                for cmd, result in zip(batch, batch_results):
+                    step_num = f"Step {idx+1}/{total_commands}: " if total_commands > 1 else ""
+                    idx += 1
                     
-                    st.session_state.chat_history.append({
-                        "role": "assistant",
-                        "content": message,
-                        "command": cmd,
-                        "status": result.get("status"),
-                        "message": message,
-                        "timestamp": datetime.now().strftime("%H:%M:%S")
-                    })
-                    all_results.append(result)
+                    if cmd.get("action") == "insight":
+                        # Handle insight questions
+                        response = cmd.get("response", "I don't have enough information to answer that.")
+                        
+                        pending.append({
+                            "role": "assistant",
+                            "content": response,
+                            "command": cmd,
+                            "response": response,
+                            "status": "insight",
+                            "timestamp": datetime.now().strftime("%H:%M:%S")
+                        })
+                        all_results.append({"status": "insight", "message": response})
+                        success_count += 1
                     
-                    # If any command fails, stop execution
-                    if result.get("status") == "error":
-                        break
+                    elif result.get("status") == "insight":
+                        # Aggregation steps answer a question and leave the data as is
+                        response = step_num + result.get("response", "")
+                        
+                        pending.append({
+                            "role": "assistant",
+                            "content": response,
+                            "command": cmd,
+                            "response": response,
+                            "status": "insight",
+                            "timestamp": datetime.now().strftime("%H:%M:%S")
+                        })
+                        all_results.append(result)
+                        success_count += 1
+                        
+                    else:
+                        # Update message with step number
+                        message = step_num + result.get("message", "")
+                        
+                        pending.append({
+                            "role": "assistant",
+                            "content": message,
+                            "command": cmd,
+                            "status": result.get("status"),
+                            "message": message,
+                            "timestamp": datetime.now().strftime("%H:%M:%S")
+                        })
+                        all_results.append(result)
+                        if result.get("status") == "success":
+                            success_count += 1
+                        
+                        # If any command fails, stop execution
+                        if result.get("status") == "error":
+                            stop = True
+                            break
+                
+                if stop:
+                    break
             
             # Add summary if multiple commands
-            if len(commands) > 1:
-                success_count = sum(1 for r in all_results if r.get("status") == "success")
-                st.session_state.chat_history.append({
+            if total_commands > 1:
+                pending.append({
                     "role": "assistant",
-                    "content": f"Completed {success_count}/{len(commands)} operations",
+                    "content": f"Completed {success_count}/{total_commands} operations",
                     "status": "summary",
                     "timestamp": datetime.now().strftime("%H:%M:%S")
                 })
             
+            # Remember the request unless it failed, so retries still go through
+            if not any(r.get("status") == "error" for r in all_results):
+                st.session_state.last_request = (request_key, time.monotonic())
+            
+            st.session_state.chat_history.extend(pending)
             st.rerun()
     
     # Download section
     st.markdown("---")
     st.markdown("### Download Modified File")
     
+    # Base name for downloads, e.g. "sales.xlsx" -> "sales"
+    file_stem = os.path.splitext(st.session_state.file_name)[0]
+    
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        # CSV download (active sheet only)
-        active_df = st.session_state.executors[st.session_state.active_sheet].get_dataframe()
-        csv = active_df.to_csv(index=False).encode('utf-8')
+        # CSV download (active sheet only), serialized only when clicked
+        active_executor = st.session_state.executors[st.session_state.active_sheet]
+        csv = partial(
+            build_csv_bytes,
+            active_executor,
+            (st.session_state.upload_id, st.session_state.active_sheet, active_executor.version)
+        )
         
         if len(st.session_state.sheet_names) > 1:
             download_label = f"Download {st.session_state.active_sheet} as CSV"
             file_name = f"{st.session_state.active_sheet}.csv"
         else:
             download_label = "Download as CSV"
-            file_name = f"modified_{st.session_state.file_name.replace('.xlsx', '').replace('.xls', '')}.csv"
+            file_name = f"modified_{file_stem}.csv"
         
         st.download_button(
             label=download_label,
@@ -824,13 +999,14 @@ else:
         )
     
     with col2:
-        # Excel download (all sheets)
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            for sheet_name in st.session_state.sheet_names:
-                # Get latest DataFrame from executor
-                sheet_df = st.session_state.executors[sheet_name].get_dataframe()
-                sheet_df.to_excel(writer, index=False, sheet_name=sheet_name)
+        # Excel download (all sheets), serialized only when clicked
+        xlsx = partial(
+            build_xlsx_bytes,
+            st.session_state.executors,
+            (st.session_state.upload_id, tuple(
+                (name, executor.version) for name, executor in st.session_state.executors.items()
+            ))
+        )
         
         if len(st.session_state.sheet_names) > 1:
             download_label = f"Download All {len(st.session_state.sheet_names)} Sheets as XLSX"
@@ -839,8 +1015,8 @@ else:
         
         st.download_button(
             label=download_label,
-            data=buffer.getvalue(),
-            file_name=f"modified_{st.session_state.file_name.replace('.csv', '')}.xlsx",
+            data=xlsx,
+            file_name=f"modified_{file_stem}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
     
@@ -850,8 +1026,8 @@ else:
             if st.session_state.executor.undo():
                 # Sync undone state back to sheets dict
                 undone_df = st.session_state.executor.get_dataframe()
-                st.session_state.sheets[st.session_state.active_sheet] = undone_df.copy()
-                st.session_state.uploaded_df = undone_df.copy()
+                st.session_state.sheets[st.session_state.active_sheet] = undone_df
+                st.session_state.uploaded_df = undone_df
                 
                 st.success("Undone")
                 st.rerun()
@@ -2,51 +2,124 @@
 Audio Transcription Helper using Faster-Whisper
 Handles speech-to-text conversion for voice input
 """
+import io
 import os
-import tempfile
-from typing import Optional, Dict, Any
+import wave
+import numpy as np
+from typing import Optional, Dict, Any, Tuple
 from pathlib import Path
 import streamlit as st
 
+# Voice input is short English commands, so the English-only tiny model is
+# the default; set SHEET_AI_WHISPER_MODEL (e.g. "base.en") to trade speed for accuracy
+DEFAULT_MODEL_SIZE = os.environ.get("SHEET_AI_WHISPER_MODEL", "tiny.en")
+
+def _select_device() -> Tuple[str, str]:
+    """
+    Pick the Whisper device and quantization
+    
+    Returns:
+        (device, compute_type): fp16 on a CUDA GPU that supports it (int8
+        weights with fp16 activations otherwise), plain int8 on CPU
+    """
+    try:
+        import ctranslate2  # installed with faster-whisper
+        if ctranslate2.get_cuda_device_count() > 0:
+            # The small Whisper models fit in fp16 on any GPU, and fp16 GEMMs
+            # skip the int8 dequantization step
+            if "float16" in ctranslate2.get_supported_compute_types("cuda"):
+                return "cuda", "float16"
+            return "cuda", "int8_float16"
+    except Exception:
+        pass
+    return "cpu", "int8"
+
+def _wav_duration(audio_file: io.BytesIO) -> Optional[float]:
+    """
+    Read a clip's duration from its WAV header, without decoding the samples
+    
+    The stream is rewound afterwards so it can be handed on as is.
+    
+    Returns:
+        Duration in seconds, or None if the clip isn't a PCM WAV file
+    """
+    try:
+        with wave.open(audio_file) as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError, ZeroDivisionError):
+        return None
+    finally:
+        audio_file.seek(0)
+
 class AudioTranscriber:
     """Handles audio transcription using Faster-Whisper"""
     
-    def __init__(self, model_size: str = "base"):
+    def __init__(self, model_size: str = "base", cpu_threads: Optional[int] = None, num_workers: int = 1):
         """
         Initialize the transcriber
         
         Args:
-            model_size: Whisper model size (tiny, base, small, medium, large)
+            model_size: Whisper model size (tiny, base, small, medium, large; ".en" for English-only)
+            cpu_threads: CTranslate2 threads per transcription on CPU (default: all cores)
+            num_workers: Transcriptions the model can run in parallel
         """
         self.model_size = model_size
+        self.cpu_threads = (os.cpu_count() or 0) if cpu_threads is None else cpu_threads  # 0 = CTranslate2 default
+        self.num_workers = num_workers
         self.model = None
         
     @st.cache_resource
-    def _get_model(_self, model_size: str):
+    def _get_model(_self, model_size: str, cpu_threads: int, num_workers: int):
         """
         Load and cache the Whisper model
         
-        Note: Uses @st.cache_resource to load model only once
+        Note: Uses @st.cache_resource to load model only once per configuration
         """
         try:
             from faster_whisper import WhisperModel
             
-            # Load model with CPU optimization
+            device, compute_type = _select_device()
             model = WhisperModel(
                 model_size,
-                device="cpu",
-                compute_type="int8"  # Optimized for CPU
+                device=device,
+                compute_type=compute_type,
+                cpu_threads=cpu_threads,
+                num_workers=num_workers
             )
             return model
         except Exception as e:
             raise RuntimeError(f"Failed to load Whisper model: {str(e)}")
     
+    def preload(self) -> bool:
+        """
+        Load the Whisper model and run one warm-up pass ahead of the first transcription
+        
+        Returns:
+            bool: True if the model is loaded
+        """
+        try:
+            if self.model is None:
+                self.model = self._get_model(self.model_size, self.cpu_threads, self.num_workers)
+                
+                # Decode a second of silence (VAD off, or nothing would reach the
+                # decoder) so weights are paged in and kernels initialized
+                try:
+                    segments, _ = self.model.transcribe(
+                        np.zeros(16000, dtype=np.float32), language="en", beam_size=1, without_timestamps=True
+                    )
+                    list(segments)  # Segments are decoded lazily
+                except Exception:
+                    pass
+            return True
+        except Exception:
+            return False
+    
     def transcribe(self, audio_input) -> Dict[str, Any]:
         """
         Transcribe audio to text
         
         Args:
-            audio_input: Either bytes or UploadedFile from st.audio_input
+            audio_input: bytes, memoryview, or UploadedFile from st.audio_input
             
         Returns:
             Dict with keys:
@@ -57,11 +130,18 @@ class AudioTranscriber:
         """
         # Handle UploadedFile from st.audio_input
         try:
-            # Check if it's an UploadedFile object (has .read() method)
-            if hasattr(audio_input, 'read'):
-                audio_bytes = audio_input.read()
+            # UploadedFile is already a BytesIO, so it is used in place; anything
+            # else is wrapped once, and that one stream serves the header check
+            # and the decoder
+            if isinstance(audio_input, io.BytesIO):
+                audio_file = audio_input
+            # Other file-like objects (has .read() method)
+            elif hasattr(audio_input, 'read'):
+                audio_file = io.BytesIO(audio_input.read())
             else:
-                audio_bytes = audio_input
+                audio_file = io.BytesIO(audio_input)
+            audio_size = audio_file.seek(0, io.SEEK_END)
+            audio_file.seek(0)
         except Exception as e:
             return {
                 "success": False,
@@ -71,7 +151,7 @@ class AudioTranscriber:
             }
         
         # Input validation
-        if not audio_bytes or len(audio_bytes) == 0:
+        if audio_size == 0:
             return {
                 "success": False,
                 "text": "",
@@ -79,44 +159,39 @@ class AudioTranscriber:
                 "duration": 0
             }
         
-        # Check minimum size (very rough check for ~0.5s at 16kHz)
-        # WAV header is ~44 bytes, 0.5s at 16kHz mono = ~16000 bytes
-        if len(audio_bytes) < 16000:
+        # Check minimum length from the WAV header (other formats go to Whisper as-is)
+        duration = _wav_duration(audio_file)
+        if duration is not None and duration < 0.5:
             return {
                 "success": False,
                 "text": "",
                 "error": "Recording too short (minimum 0.5 seconds)",
-                "duration": 0
+                "duration": duration
             }
         
-        temp_file = None
         try:
             # Load model (cached)
             if self.model is None:
-                self.model = self._get_model(self.model_size)
+                self.model = self._get_model(self.model_size, self.cpu_threads, self.num_workers)
             
-            # Save audio to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as f:
-                f.write(audio_bytes)
-                temp_file = f.name
-            
-            # Transcribe
+            # Transcribe. Clips are short dictated commands: greedy decoding
+            # with no temperature fallback or timestamp tokens is enough
             segments, info = self.model.transcribe(
-                temp_file,
+                audio_file,  # Decoded in memory, no temp file round trip
                 language="en",
-                beam_size=5,
+                beam_size=1,
+                temperature=0.0,
+                condition_on_previous_text=False,
+                without_timestamps=True,
                 vad_filter=True,  # Voice activity detection
                 vad_parameters=dict(
                     min_silence_duration_ms=500
                 )
             )
             
-            # Extract text from segments
-            text_parts = []
-            for segment in segments:
-                text_parts.append(segment.text.strip())
-            
-            transcript = " ".join(text_parts).strip()
+            # Extract text from segments (decoded lazily as the join consumes them;
+            # per-segment strip since Whisper prefixes each with a space)
+            transcript = " ".join(segment.text.strip() for segment in segments).strip()
             
             # Validate output
             if not transcript or len(transcript) < 2:
@@ -141,14 +216,6 @@ class AudioTranscriber:
                 "error": f"Transcription failed: {str(e)}",
                 "duration": 0
             }
-        
-        finally:
-            # Clean up temp file
-            if temp_file and os.path.exists(temp_file):
-                try:
-                    os.unlink(temp_file)
-                except:
-                    pass
 
 # Singleton instance
 _transcriber_instance = None
@@ -157,5 +224,5 @@ def get_transcriber() -> AudioTranscriber:
     """Get or create the global transcriber instance"""
     global _transcriber_instance
     if _transcriber_instance is None:
-        _transcriber_instance = AudioTranscriber(model_size="base")
+        _transcriber_instance = AudioTranscriber(model_size=DEFAULT_MODEL_SIZE)
     return _transcriber_instance
@@ -2,12 +2,12 @@
 Create a multi-sheet test Excel file for testing Sheet-AI-Agent
 """
 
+import importlib.util
 import pandas as pd
-from datetime import datetime, timedelta
 
 # Sheet 1: Sales Data
 sales_data = {
-    'Date': [datetime(2024, 1, i).strftime('%Y-%m-%d') for i in range(1, 11)],
+    'Date': pd.date_range('2024-01-01', periods=10).strftime('%Y-%m-%d').tolist(),
     'Product': ['Laptop', 'Mouse', 'Keyboard', 'Monitor', 'Laptop', 
                 'Mouse', 'Headphones', 'Keyboard', 'Monitor', 'Laptop'],
     'Quantity': [2, 15, 8, 3, 1, 20, 5, 10, 2, 3],
@@ -52,7 +52,10 @@ df_targets = pd.DataFrame(targets_data)
 # Create Excel file with multiple sheets
 output_file = 'test_multi_sheet.xlsx'
 
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+# xlsxwriter streams the XML directly; openpyxl is the fallback
+engine = 'xlsxwriter' if importlib.util.find_spec('xlsxwriter') else 'openpyxl'
+
+with pd.ExcelWriter(output_file, engine=engine) as writer:
     df_sales.to_excel(writer, sheet_name='Sales', index=False)
     df_employees.to_excel(writer, sheet_name='Employees', index=False)
     df_inventory.to_excel(writer, sheet_name='Inventory', index=False)
@@ -3,17 +3,125 @@ Command executor for Sheet-Editor AI Agent
 Routes commands to appropriate operation modules
 """
 
+import asyncio
+import json
 import pandas as pd
-from typing import Dict, Any, List, Optional
+from collections import deque
+from typing import Dict, Any, List, Optional, Deque, Tuple
 from operations import row_ops, column_ops, cell_ops, date_ops, numeric_ops, type_ops, aggregation_ops
 
+# Action name -> operation returning the modified DataFrame
+DATAFRAME_OPS = {
+    # Row operations
+    "delete_row": row_ops.delete_row,
+    "delete_rows": row_ops.delete_rows,
+    "delete_rows_condition": row_ops.delete_rows_condition,
+    "keep_rows_condition": row_ops.keep_rows_condition,
+    "insert_row": row_ops.insert_row,
+    "sort_rows": row_ops.sort_rows,
+    "remove_duplicates": row_ops.remove_duplicates,
+    # Column operations
+    "delete_column": column_ops.delete_column,
+    "rename_column": column_ops.rename_column,
+    "add_constant_column": column_ops.add_constant_column,
+    "add_empty_column": column_ops.add_empty_column,
+    "reorder_columns": column_ops.reorder_columns,
+    "duplicate_column": column_ops.duplicate_column,
+    "merge_columns": column_ops.merge_columns,
+    # Cell operations
+    "replace_text": cell_ops.replace_text,
+    "replace_conditional": cell_ops.replace_conditional,
+    "set_column_value": cell_ops.set_column_value,
+    "fill_na": cell_ops.fill_na,
+    "trim_whitespace": cell_ops.trim_whitespace,
+    "change_case": cell_ops.change_case,
+    "assign_sequence": cell_ops.assign_sequence,
+    # Date operations
+    "reformat_date": date_ops.reformat_date,
+    "extract_date_part": date_ops.extract_date_part,
+    "extract_date_parts": date_ops.extract_date_parts,
+    "convert_to_datetime": date_ops.convert_to_datetime,
+    "calculate_duration": date_ops.calculate_duration,
+    # Numeric operations
+    "multiply_column": numeric_ops.multiply_column,
+    "add_to_column": numeric_ops.add_to_column,
+    "round_column": numeric_ops.round_column,
+    "normalize_column": numeric_ops.normalize_column,
+    "create_ratio": numeric_ops.create_ratio,
+    # Type conversion
+    "convert_type": type_ops.convert_type,
+}
+
+# Action name -> aggregation returning an insight (DataFrame left unchanged)
+AGGREGATION_OPS = {
+    "group_aggregate": aggregation_ops.group_aggregate,
+    "count_by_category": aggregation_ops.count_by_category,
+    "unique_counts": aggregation_ops.unique_counts,
+    "summary_stats": aggregation_ops.summary_stats,
+}
+
+# Actions that only read the DataFrame (safe to run side by side)
+READ_ONLY_ACTIONS = {"insight", *AGGREGATION_OPS}
+
 class ExecutionError(Exception):
     """Custom exception for execution errors"""
     pass
 
+
+def normalize_plan(command: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Normalize an LLM response into a list of commands and validate it
+    
+    Args:
+        command: Single command dict or list of commands
+        
+    Returns:
+        tuple: (commands, error) - error describes the first invalid entry, or None
+    """
+    if isinstance(command, dict):
+        commands = [command]
+    elif isinstance(command, list):
+        commands = command
+    else:
+        return [], f"LLM returned {type(command)} instead of dict or list"
+    
+    invalid = next((cmd for cmd in commands if not isinstance(cmd, dict) or "action" not in cmd), None)
+    if invalid is not None:
+        return commands, f"Command missing 'action' field. Got: {invalid}"
+    return commands, None
+
+
+def plan_batches(commands: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Split a multi-step plan into execution batches
+    
+    Consecutive read-only commands are grouped together; every mutating
+    command gets a batch of its own so steps still apply in order.
+    
+    Args:
+        commands: Commands in plan order
+        
+    Returns:
+        list: Batches of commands, in plan order
+    """
+    batches: List[List[Dict[str, Any]]] = []
+    for command in commands:
+        read_only = command.get("action") in READ_ONLY_ACTIONS
+        if read_only and batches and batches[-1][0].get("action") in READ_ONLY_ACTIONS:
+            batches[-1].append(command)
+        else:
+            batches.append([command])
+    return batches
+
+
 class Executor:
     """Executes structured commands on DataFrames"""
     
+    # Max number of DataFrame snapshots kept for undo
+    MAX_HISTORY = 20
+    # Max number of aggregation results remembered for the current DataFrame
+    MAX_CACHED_INSIGHTS = 32
+    
     def __init__(self, df: pd.DataFrame):
         """
         Initialize executor with DataFrame
@@ -21,10 +129,29 @@ class Executor:
         Args:
             df: Initial DataFrame
         """
+        self._context: Optional[Dict[str, Any]] = None
+        # One private copy serves as both the live frame and the first undo
+        # snapshot: operations return new frames rather than mutating it
         self.df = df.copy()
         self.history: List[Dict[str, Any]] = []
-        self.df_history: List[pd.DataFrame] = [df.copy()]
+        # Last entry is always the current frame. Bounded so long sessions
+        # don't pin every past version in memory
+        self.df_history: Deque[pd.DataFrame] = deque([self.df], maxlen=self.MAX_HISTORY)
+        # Bumped on every change to self.df so callers can cache derived data
+        self.version = 0
         
+    @property
+    def df(self) -> pd.DataFrame:
+        """Current DataFrame"""
+        return self._df
+    
+    @df.setter
+    def df(self, df: pd.DataFrame) -> None:
+        self._df = df
+        self._context = None  # Rebuilt lazily by get_context()
+        # Aggregation results for this frame, keyed by (action, parameters)
+        self._insight_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    
     def execute(self, command: Dict[str, Any]) -> Dict[str, Any]:
         """
         Execute a command
@@ -59,35 +186,22 @@ class Executor:
         
         # Execute operation
         try:
-            # Save current state before execution
-            self.df_history.append(self.df.copy())
-            
             # Route to appropriate operation
-            if action in ["delete_row", "delete_rows", "delete_rows_condition", "keep_rows_condition",
-                         "insert_row", "sort_rows", "remove_duplicates"]:
-                self.df = self._execute_row_op(action, parameters)
-                
-            elif action in ["delete_column", "rename_column", "add_constant_column", "add_empty_column",
-                           "reorder_columns", "duplicate_column", "merge_columns"]:
-                self.df = self._execute_column_op(action, parameters)
-                
-            elif action in ["replace_text", "replace_conditional", "set_column_value", 
-                           "fill_na", "trim_whitespace", "change_case", "assign_sequence"]:
-                self.df = self._execute_cell_op(action, parameters)
-                
-            elif action in ["reformat_date", "extract_date_part", "convert_to_datetime", "calculate_duration"]:
-                self.df = self._execute_date_op(action, parameters)
-                
-            elif action in ["multiply_column", "add_to_column", "round_column", 
-                           "normalize_column", "create_ratio"]:
-                self.df = self._execute_numeric_op(action, parameters)
+            if action in DATAFRAME_OPS:
+                # Operations return a new frame and never modify their input,
+                # so a failure leaves self.df and the history untouched
+                self.df = DATAFRAME_OPS[action](self.df, **parameters)
+                self.df_history.append(self.df)
                 
-            elif action == "convert_type":
-                self.df = self._execute_type_op(action, parameters)
-            
-            elif action in ["group_aggregate", "count_by_category", "unique_counts", "summary_stats"]:
-                # Aggregation operations return insights, not DataFrame modifications
-                insight_result = self._execute_aggregation_op(action, parameters)
+            elif action in AGGREGATION_OPS:
+                # Aggregation operations return insights, not DataFrame modifications.
+                # Repeat questions against an unchanged frame reuse the result
+                cache_key = (action, json.dumps(parameters, sort_keys=True, default=str))
+                insight_result = self._insight_cache.get(cache_key)
+                if insight_result is None:
+                    insight_result = AGGREGATION_OPS[action](self.df, **parameters)
+                    if len(self._insight_cache) < self.MAX_CACHED_INSIGHTS:
+                        self._insight_cache[cache_key] = insight_result
                 return {
                     "status": "insight",
                     "response": insight_result.get("response", ""),
@@ -98,6 +212,8 @@ class Executor:
             else:
                 raise ExecutionError(f"Unsupported action: {action}")
             
+            self.version += 1
+            
             # Log successful execution
             self.history.append({
                 "action": action,
@@ -115,10 +231,6 @@ class Executor:
             }
             
         except Exception as e:
-            # Rollback on error
-            if len(self.df_history) > 1:
-                self.df = self.df_history.pop()
-            
             return {
                 "status": "error",
                 "message": f"Execution failed: {str(e)}",
@@ -126,107 +238,22 @@ class Executor:
                 "error_detail": str(e)
             }
     
-    def _execute_row_op(self, action: str, params: dict) -> pd.DataFrame:
-        """Execute row operation"""
-        if action == "delete_row":
-            return row_ops.delete_row(self.df, **params)
-        elif action == "delete_rows":
-            return row_ops.delete_rows(self.df, **params)
-        elif action == "delete_rows_condition":
-            return row_ops.delete_rows_condition(self.df, **params)
-        elif action == "keep_rows_condition":
-            return row_ops.keep_rows_condition(self.df, **params)
-        elif action == "insert_row":
-            return row_ops.insert_row(self.df, **params)
-        elif action == "sort_rows":
-            return row_ops.sort_rows(self.df, **params)
-        elif action == "remove_duplicates":
-            return row_ops.remove_duplicates(self.df, **params)
-        else:
-            raise ExecutionError(f"Unknown row operation: {action}")
-    
-    def _execute_column_op(self, action: str, params: dict) -> pd.DataFrame:
-        """Execute column operation"""
-        if action == "delete_column":
-            return column_ops.delete_column(self.df, **params)
-        elif action == "rename_column":
-            return column_ops.rename_column(self.df, **params)
-        elif action == "add_constant_column":
-            return column_ops.add_constant_column(self.df, **params)
-        elif action == "add_empty_column":
-            return column_ops.add_empty_column(self.df, **params)
-        elif action == "reorder_columns":
-            return column_ops.reorder_columns(self.df, **params)
-        elif action == "duplicate_column":
-            return column_ops.duplicate_column(self.df, **params)
-        elif action == "merge_columns":
-            return column_ops.merge_columns(self.df, **params)
-        else:
-            raise ExecutionError(f"Unknown column operation: {action}")
-    
-    def _execute_cell_op(self, action: str, params: dict) -> pd.DataFrame:
-        """Execute cell operation"""
-        if action == "replace_text":
-            return cell_ops.replace_text(self.df, **params)
-        elif action == "replace_conditional":
-            return cell_ops.replace_conditional(self.df, **params)
-        elif action == "set_column_value":
-            return cell_ops.set_column_value(self.df, **params)
-        elif action == "fill_na":
-            return cell_ops.fill_na(self.df, **params)
-        elif action == "trim_whitespace":
-            return cell_ops.trim_whitespace(self.df, **params)
-        elif action == "change_case":
-            return cell_ops.change_case(self.df, **params)
-        elif action == "assign_sequence":
-            return cell_ops.assign_sequence(self.df, **params)
-        else:
-            raise ExecutionError(f"Unknown cell operation: {action}")
-    
-    def _execute_date_op(self, action: str, params: dict) -> pd.DataFrame:
-        """Execute date operation"""
-        if action == "reformat_date":
-            return date_ops.reformat_date(self.df, **params)
-        elif action == "extract_date_part":
-            return date_ops.extract_date_part(self.df, **params)
-        elif action == "convert_to_datetime":
-            return date_ops.convert_to_datetime(self.df, **params)
-        elif action == "calculate_duration":
-            return date_ops.calculate_duration(self.df, **params)
-        else:
-            raise ExecutionError(f"Unknown date operation: {action}")
-    
-    def _execute_numeric_op(self, action: str, params: dict) -> pd.DataFrame:
-        """Execute numeric operation"""
-        if action == "multiply_column":
-            return numeric_ops.multiply_column(self.df, **params)
-        elif action == "add_to_column":
-            return numeric_ops.add_to_column(self.df, **params)
-        elif action == "round_column":
-            return numeric_ops.round_column(self.df, **params)
-        elif action == "normalize_column":
-            return numeric_ops.normalize_column(self.df, **params)
-        elif action == "create_ratio":
-            return numeric_ops.create_ratio(self.df, **params)
-        else:
-            raise ExecutionError(f"Unknown numeric operation: {action}")
-    
-    def _execute_type_op(self, action: str, params: dict) -> pd.DataFrame:
-        """Execute type conversion"""
-        return type_ops.convert_type(self.df, **params)
-    
-    def _execute_aggregation_op(self, action: str, params: dict) -> Dict[str, Any]:
-        """Execute aggregation operation (returns insight)"""
-        if action == "group_aggregate":
-            return aggregation_ops.group_aggregate(self.df, **params)
-        elif action == "count_by_category":
-            return aggregation_ops.count_by_category(self.df, **params)
-        elif action == "unique_counts":
-            return aggregation_ops.unique_counts(self.df, **params)
-        elif action == "summary_stats":
-            return aggregation_ops.summary_stats(self.df, **params)
-        else:
-            raise ExecutionError(f"Unknown aggregation operation: {action}")
+    async def execute_concurrently(self, commands: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Execute read-only commands concurrently against the current DataFrame
+        
+        Args:
+            commands: Commands whose actions are all in READ_ONLY_ACTIONS
+            
+        Returns:
+            list: Execution results, in the same order as commands
+        """
+        for command in commands:
+            if command.get("action") not in READ_ONLY_ACTIONS:
+                raise ExecutionError(f"Cannot run mutating action concurrently: {command.get('action')}")
+        
+        results = await asyncio.gather(*(asyncio.to_thread(self.execute, command) for command in commands))
+        return list(results)
     
     def undo(self) -> bool:
         """
@@ -237,15 +264,52 @@ class Executor:
         """
         if len(self.df_history) > 1:
             self.df_history.pop()  # Remove current
-            self.df = self.df_history[-1].copy()  # Restore previous
+            self.df = self.df_history[-1]  # Restore previous (shared, never mutated)
+            self.version += 1
             if len(self.history) > 0:
                 self.history.pop()
             return True
         return False
     
+    def replace_dataframe(self, df: pd.DataFrame) -> None:
+        """
+        Replace the current DataFrame (e.g. after manual edits), keeping it undoable
+        
+        Args:
+            df: New DataFrame; stored by reference, so it must not be mutated afterwards
+        """
+        self.df = df
+        self.df_history.append(df)
+        self.version += 1
+    
+    def get_context(self) -> Dict[str, Any]:
+        """
+        Get a compact description of the current DataFrame for LLM prompts
+        
+        Returns:
+            Dict with columns, shape, dtypes and a 3-row JSON preview. Built once
+            per DataFrame and reused until it changes
+        """
+        if self._context is None:
+            df = self._df
+            self._context = {
+                "columns": list(df.columns),
+                "shape": df.shape,
+                "dtypes": df.dtypes.astype(str).to_dict(),
+                # C-level JSON writer; goes into the prompt as-is, no per-cell boxing
+                "preview": df.head(3).to_json(orient='records', date_format='iso')
+            }
+        return self._context
+    
     def get_dataframe(self) -> pd.DataFrame:
-        """Get current DataFrame"""
-        return self.df.copy()
+        """
+        Get current DataFrame
+        
+        Returns:
+            The live frame, not a copy: callers must not modify it in place
+            (the app runs with pandas copy-on-write, which enforces that)
+        """
+        return self.df
     
     def get_history(self) -> List[Dict[str, Any]]:
         """Get execution history"""
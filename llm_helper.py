@@ -3,94 +3,26 @@ LLM Helper for Sheet-Editor AI Agent
 Generates structured JSON commands from natural language requests
 """
 
+import asyncio
+import copy
 import json
+import queue
 import re
-import requests
-from typing import Dict, List, Optional, Any
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Callable, Tuple
 
-class LLMHelper:
-    """Interface to LLM API providers (Groq or OpenAI)"""
-    
-    def __init__(self, api_key: str, provider: str = "groq", model: str = None):
-        """
-        Initialize LLM helper
-        
-        Args:
-            api_key: API key (Groq or OpenAI)
-            provider: "groq" or "openai"
-            model: Model name (auto-selected if None)
-        """
-        self.api_key = api_key
-        self.provider = provider
-        
-        # Auto-select model based on provider
-        if model is None:
-            model = "openai/gpt-oss-20b" if provider == "groq" else "gpt-4o-mini"
-        
-        self.model = model
-        
-        if provider == "groq":
-            try:
-                from groq import Groq
-                import httpx
-                # Use custom httpx client to fix SSL issues on Windows
-                http_client = httpx.Client(verify=False)
-                self.client = Groq(api_key=api_key, http_client=http_client)
-            except ImportError as e:
-                if "groq" in str(e):
-                    raise ImportError("Groq SDK not installed. Run: pip install groq")
-                raise ImportError("httpx not installed. Run: pip install httpx")
-        elif provider == "openai":
-            try:
-                from openai import OpenAI
-                import httpx
-                # Use custom httpx client to fix SSL issues on Windows
-                http_client = httpx.Client(verify=False)
-                self.client = OpenAI(api_key=api_key, http_client=http_client)
-            except ImportError as e:
-                if "openai" in str(e):
-                    raise ImportError("OpenAI SDK not installed. Run: pip install openai")
-                raise ImportError("httpx not installed. Run: pip install httpx")
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
-    
-    def _call_api(self, prompt: str, system: str = "") -> str:
-        """Make API call to configured provider (Groq or OpenAI)"""
-        try:
-            # Ensure strings are properly encoded (remove problematic characters)
-            prompt = prompt.encode('ascii', 'ignore').decode('ascii')
-            system = system.encode('ascii', 'ignore').decode('ascii')
-            
-            messages = []
-            if system:
-                messages.append({"role": "system", "content": system})
-            messages.append({"role": "user", "content": prompt})
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.1,  # Low temperature for deterministic commands
-                max_tokens=1000
-            )
-            
-            return response.choices[0].message.content.strip()
-            
-        except Exception as e:
-            return json.dumps({"error": f"API Error: {str(e)}"})
-    
-    def generate_command(self, user_request: str, df_context: dict, conversation_history: list = None) -> dict:
-        """
-        Generate structured command from natural language request
-        
-        Args:
-            user_request: User's natural language instruction
-            df_context: DataFrame metadata (columns, shape, preview)
-            conversation_history: Recent chat history for context
-            
-        Returns:
-            dict: Structured command or insight response
-        """
-        system = """You are a data manipulation assistant. Given a user request and DataFrame context,
+# Markdown code fence around a response; the closing fence is optional since
+# streamed responses stop as soon as the JSON is complete
+_FENCED_RE = re.compile(r'```(?:json)?\s*(.*?)(?:\s*```)?', re.DOTALL)
+# Fallbacks for JSON embedded in surrounding prose
+_ARRAY_RE = re.compile(r'(\[.*\])', re.DOTALL)
+_OBJECT_RE = re.compile(r'(\{.*\})', re.DOTALL)
+
+# System prompts are fixed text; keeping them identical across requests also
+# lets providers reuse their cached prompt prefix
+_COMMAND_SYSTEM_PROMPT = """You are a data manipulation assistant. Given a user request and DataFrame context,
 output a STRUCTURED COMMAND in JSON format.
 
 CRITICAL RULES:
@@ -105,6 +37,7 @@ MULTI-STEP HANDLING:
 - If user asks for ONE thing: return single command object
 - If user asks for MULTIPLE things: return array of command objects
 - Execute commands in logical order (e.g., rename before using new name)
+- If user also asks a question, answer it as a step in the SAME array (an "insight" or aggregation action), after the changes it depends on
 
 COMMAND vs INSIGHT:
 - "Remove row 3" -> COMMAND (modifies data)
@@ -144,6 +77,7 @@ Supported COMMAND actions:
 **Date/Time Operations:**
 - reformat_date: {"column": str, "old_format": str, "new_format": str}
 - extract_date_part: {"column": str, "part": "year"/"month"/"day", "target_column": str}
+- extract_date_parts: {"column": str, "parts": ["year"/"month"/"day", ...], "target_columns": [str, ...]}  # several parts from one column in one step
 - convert_to_datetime: {"column": str}
 - calculate_duration: {"start_col": str, "end_col": str, "target_col": str, "unit": "days"/"hours"}
 
@@ -208,23 +142,502 @@ Output: [
   {"action": "add_constant_column", "parameters": {"column_name": "Status", "value": "Active"}, "reasoning": "Add Status column"}
 ]
 
+User: "Delete rows where Status is Closed and tell me how many are left per Region"
+Output: [
+  {"action": "delete_rows_condition", "parameters": {"column": "Status", "operator": "==", "value": "Closed"}, "reasoning": "Remove closed rows"},
+  {"action": "count_by_category", "parameters": {"column": "Region"}, "reasoning": "Count remaining rows per region"}
+]
+
 User: "What's the total revenue by country?"
 Output: {"action": "group_aggregate", "parameters": {"group_by": ["country"], "agg_column": "revenue", "agg_func": "sum"}, "reasoning": "User wants aggregated revenue by country"}
 
 User: "Change first column values to 7"
 Output: {"action": "set_column_value", "parameters": {"column": "<first column name>", "value": 7}, "reasoning": "Set all values in first column to 7"}
 """
+
+_INSIGHT_SYSTEM_PROMPT = """You are a data analyst assistant. Answer questions about DataFrames concisely and accurately.
+
+RULES:
+1. Base answers ONLY on provided context and statistics
+2. Be concise - 1-2 sentences
+3. Include specific numbers when available
+4. Don't hallucinate insights not in the data
+"""
+
+
+class _JsonEndScanner:
+    """
+    Incrementally track bracket depth of streamed text to spot the end of
+    the first top-level JSON object or array
+    
+    Text before the first "{" or "[" (e.g. a markdown fence) is ignored,
+    and brackets inside string literals are not counted.
+    """
+    
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, text: str) -> bool:
+        """Consume the next chunk; return True once the first value has closed"""
+        for ch in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch in "{[":
+                self.started = True
+                self.depth += 1
+            elif not self.started:
+                continue
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    return True
+        return False
+
+
+def _resolve_column(name: str, columns: list) -> Optional[str]:
+    """Map a column name typed by the user to the real column, or None if unknown/ambiguous"""
+    name = name.strip().strip("'\"`")
+    if name in columns:
+        return name
+    matches = [col for col in columns if str(col).lower() == name.lower()]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _fast_delete_row(match, df_context):
+    row = int(match.group(1))
+    return {"action": "delete_row", "parameters": {"row_index": row},
+            "reasoning": f"Delete row {row}"}
+
+
+def _fast_delete_column(match, df_context):
+    column = _resolve_column(match.group(1), df_context.get("columns", []))
+    if column is None:
+        return None
+    return {"action": "delete_column", "parameters": {"column_name": column},
+            "reasoning": f"Delete column {column}"}
+
+
+def _fast_rename_column(match, df_context):
+    columns = df_context.get("columns", [])
+    old_name = _resolve_column(match.group(1), columns)
+    new_name = match.group(2).strip().strip("'\"`")
+    if old_name is None or not new_name or new_name in columns:
+        return None
+    return {"action": "rename_column", "parameters": {"old_name": old_name, "new_name": new_name},
+            "reasoning": f"Rename {old_name} to {new_name}"}
+
+
+def _fast_sort_rows(match, df_context):
+    column = _resolve_column(match.group(1), df_context.get("columns", []))
+    if column is None:
+        return None
+    ascending = not (match.group(2) or "").lower().startswith("desc")
+    return {"action": "sort_rows", "parameters": {"column": column, "ascending": ascending},
+            "reasoning": f"Sort rows by {column}"}
+
+
+def _fast_unique_counts(match, df_context):
+    column = _resolve_column(match.group(1), df_context.get("columns", []))
+    if column is None:
+        return None
+    return {"action": "unique_counts", "parameters": {"column": column},
+            "reasoning": f"Count unique values in {column}"}
+
+
+def _fast_remove_duplicates(match, df_context):
+    return {"action": "remove_duplicates", "parameters": {"subset_columns": None},
+            "reasoning": "Remove duplicate rows"}
+
+
+def _fast_count(match, df_context):
+    shape = df_context.get("shape")
+    if not shape:
+        return None
+    rows, cols = shape
+    if match.group(1).lower().startswith("row"):
+        response = f"The data has {rows} rows."
+    else:
+        response = f"The data has {cols} columns."
+    return {"action": "insight", "response": response, "reasoning": "Read from the DataFrame shape"}
+
+
+# Requests simple enough to turn into a command without a model call. Each
+# pattern must match the whole (normalized) request; a builder returning None
+# (e.g. unknown column) defers to the LLM.
+_FAST_PATH_RULES = [
+    (re.compile(r"(?:delete|remove|drop)\s+row\s+(?:number\s+|#)?(\d+)", re.I), _fast_delete_row),
+    (re.compile(r"(?:delete|remove|drop)\s+(?:the\s+)?column\s+(.+)", re.I), _fast_delete_column),
+    (re.compile(r"rename\s+(?:the\s+)?(?:column\s+)?(.+?)\s+(?:to|as)\s+(.+)", re.I), _fast_rename_column),
+    (re.compile(r"(?:sort|order)\s+(?:the\s+)?(?:rows\s+|data\s+)?by\s+(.+?)(?:\s+(asc|ascending|desc|descending))?", re.I), _fast_sort_rows),
+    (re.compile(r"(?:count\s+)?(?:unique|distinct)\s+(?:values|counts)\s+(?:in|of|for)\s+(.+)", re.I), _fast_unique_counts),
+    (re.compile(r"(?:remove|delete|drop)\s+(?:the\s+)?duplicates?(?:\s+rows)?", re.I), _fast_remove_duplicates),
+    (re.compile(r"(?:how\s+many|count(?:\s+the)?|number\s+of)\s+(rows|columns)(?:\s+are\s+there)?", re.I), _fast_count),
+]
+
+
+def _fast_path_command(user_request: str, df_context: dict) -> Optional[dict]:
+    """Build the command for a trivial request without the LLM, or return None"""
+    request = " ".join(user_request.split()).rstrip(".!?")
+    for pattern, build in _FAST_PATH_RULES:
+        match = pattern.fullmatch(request)
+        if match:
+            return build(match, df_context)
+    return None
+
+
+# One background event loop for every helper: the app keeps a helper per
+# API key/provider/model, and each would otherwise hold a thread of its own
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared background event loop, starting its thread on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-helper-loop", daemon=True).start()
+        return _loop
+
+
+def _close_async_client(client) -> None:
+    """Schedule an async SDK client's close on the shared loop (finalizer; doesn't wait)"""
+    if _loop is not None and not _loop.is_closed():
+        asyncio.run_coroutine_threadsafe(client.close(), _loop)
+
+
+class LLMHelper:
+    """Interface to LLM API providers (Groq or OpenAI)"""
+    
+    # Max number of generated command plans remembered per helper
+    COMMAND_CACHE_SIZE = 128
+    # Chat messages quoted in the command prompt, and chars kept from each
+    HISTORY_MESSAGES = 6
+    HISTORY_MESSAGE_CHARS = 150
+    
+    def __init__(self, api_key: str, provider: str = "groq", model: str = None):
+        """
+        Initialize LLM helper
+        
+        Args:
+            api_key: API key (Groq or OpenAI)
+            provider: "groq" or "openai"
+            model: Model name (auto-selected if None)
+        """
+        self.api_key = api_key
+        self.provider = provider
+        
+        # Auto-select model based on provider
+        if model is None:
+            model = "openai/gpt-oss-20b" if provider == "groq" else "gpt-4o-mini"
+        
+        self.model = model
+        self._command_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+        # The app shares one helper across sessions (st.cache_resource)
+        self._command_cache_lock = threading.Lock()
+        # Pooled async client on the shared background loop, opened on first use
+        self._async_client = None
+        self._async_client_finalizer = None
+        
+        if provider == "groq":
+            try:
+                from groq import Groq
+                import httpx
+                # Use custom httpx client to fix SSL issues on Windows
+                http_client = httpx.Client(verify=False)
+                self.client = Groq(api_key=api_key, http_client=http_client)
+            except ImportError as e:
+                if "groq" in str(e):
+                    raise ImportError("Groq SDK not installed. Run: pip install groq")
+                raise ImportError("httpx not installed. Run: pip install httpx")
+        elif provider == "openai":
+            try:
+                from openai import OpenAI
+                import httpx
+                # Use custom httpx client to fix SSL issues on Windows
+                http_client = httpx.Client(verify=False)
+                self.client = OpenAI(api_key=api_key, http_client=http_client)
+            except ImportError as e:
+                if "openai" in str(e):
+                    raise ImportError("OpenAI SDK not installed. Run: pip install openai")
+                raise ImportError("httpx not installed. Run: pip install httpx")
+        else:
+            raise ValueError(f"Unsupported provider: {provider}")
+    
+    def _build_messages(self, prompt: str, system: str = "") -> List[Dict[str, str]]:
+        """Build the chat messages list for a request"""
+        # Ensure strings are properly encoded (remove problematic characters)
+        prompt = prompt.encode('ascii', 'ignore').decode('ascii')
+        system = system.encode('ascii', 'ignore').decode('ascii')
         
+        messages = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
+    def _call_api(self, prompt: str, system: str = "") -> str:
+        """Make API call to configured provider (Groq or OpenAI)"""
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._build_messages(prompt, system),
+                temperature=0.1,  # Low temperature for deterministic commands
+                max_tokens=1000
+            )
+            
+            return response.choices[0].message.content.strip()
+            
+        except Exception as e:
+            return json.dumps({"error": f"API Error: {str(e)}"})
+    
+    def _create_async_client(self, http_client):
+        """Create the async SDK client for the configured provider"""
+        if self.provider == "groq":
+            from groq import AsyncGroq
+            return AsyncGroq(api_key=self.api_key, http_client=http_client)
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=self.api_key, http_client=http_client)
+    
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the background event loop shared by all helpers"""
+        return _background_loop()
+    
+    def _shared_async_client(self):
+        """Async SDK client kept open on the background loop so connections are reused"""
+        if self._async_client is None:
+            import httpx
+            self._async_client = self._create_async_client(httpx.AsyncClient(verify=False))
+            # Helpers dropped without close() (e.g. evicted from st.cache_resource)
+            # still release their connection pool once garbage collected
+            self._async_client_finalizer = weakref.finalize(self, _close_async_client, self._async_client)
+        return self._async_client
+    
+    async def _acall_api(self, prompt: str, system: str = "",
+                         on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Make a streaming API call without blocking on the full response
+        
+        Returns as soon as the first complete JSON object or array has
+        streamed in, closing the stream instead of waiting for the rest.
+        
+        Args:
+            prompt: User prompt
+            system: System prompt
+            on_token: Optional callback receiving the accumulated text after each chunk
+        """
+        try:
+            if asyncio.get_running_loop() is _loop:
+                return await self._astream(self._shared_async_client(), prompt, system, on_token)
+            
+            import httpx
+            
+            # Any other loop (e.g. asyncio.run) gets a client of its own, since
+            # the async transport is bound to the loop it was opened on
+            async with httpx.AsyncClient(verify=False) as http_client:
+                client = self._create_async_client(http_client)
+                return await self._astream(client, prompt, system, on_token)
+            
+        except Exception as e:
+            return json.dumps({"error": f"API Error: {str(e)}"})
+    
+    async def _astream(self, client, prompt: str, system: str,
+                       on_token: Optional[Callable[[str], None]]) -> str:
+        """Stream a completion from an async client until its JSON is complete"""
+        stream = await client.chat.completions.create(
+            model=self.model,
+            messages=self._build_messages(prompt, system),
+            temperature=0.1,  # Low temperature for deterministic commands
+            max_tokens=1000,
+            stream=True
+        )
+        
+        parts = []
+        scanner = _JsonEndScanner()
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                if on_token is not None:
+                    on_token("".join(parts))
+                # Stop as soon as the command JSON is complete; anything
+                # after it (closing fence, trailing prose) is discarded
+                if scanner.feed(delta):
+                    await stream.close()
+                    break
+        
+        return "".join(parts).strip()
+    
+    def close(self) -> None:
+        """Close pooled HTTP connections (the shared event loop keeps running)"""
+        client, self._async_client = self._async_client, None
+        if client is not None:
+            self._async_client_finalizer.detach()
+            asyncio.run_coroutine_threadsafe(client.close(), _background_loop()).result()
+        self.client.close()
+    
+    def generate_command(self, user_request: str, df_context: dict, conversation_history: list = None) -> dict:
+        """
+        Generate structured command from natural language request
+        
+        Args:
+            user_request: User's natural language instruction
+            df_context: DataFrame metadata (columns, shape, dtypes, preview as a JSON records string)
+            conversation_history: Recent chat history for context
+            
+        Returns:
+            dict: Structured command or insight response
+        """
+        fast = _fast_path_command(user_request, df_context)
+        if fast is not None:
+            return fast
+        
+        cache_key = self._command_cache_key(user_request, df_context, conversation_history)
+        cached = self._get_cached_command(cache_key)
+        if cached is not None:
+            return cached
+        
+        prompt, system = self._build_command_prompt(user_request, df_context, conversation_history)
+        response = self._call_api(prompt, system)
+        command = self._parse_command_response(response)
+        self._store_command(cache_key, command)
+        return command
+    
+    async def agenerate_command(self, user_request: str, df_context: dict, conversation_history: list = None,
+                                on_token: Optional[Callable[[str], None]] = None) -> dict:
+        """
+        Async, streaming variant of generate_command
+        
+        Args:
+            user_request: User's natural language instruction
+            df_context: DataFrame metadata (columns, shape, preview)
+            conversation_history: Recent chat history for context
+            on_token: Optional callback receiving the partial response as it streams
+            
+        Returns:
+            dict: Structured command or insight response
+        """
+        fast = _fast_path_command(user_request, df_context)
+        if fast is not None:
+            return fast
+        
+        cache_key = self._command_cache_key(user_request, df_context, conversation_history)
+        cached = self._get_cached_command(cache_key)
+        if cached is not None:
+            return cached
+        
+        prompt, system = self._build_command_prompt(user_request, df_context, conversation_history)
+        response = await self._acall_api(prompt, system, on_token=on_token)
+        command = self._parse_command_response(response)
+        self._store_command(cache_key, command)
+        return command
+    
+    def stream_command(self, user_request: str, df_context: dict, conversation_history: list = None,
+                       on_token: Optional[Callable[[str], None]] = None) -> dict:
+        """
+        Blocking wrapper around agenerate_command for synchronous callers
+        
+        The request runs on the helper's background event loop, which keeps
+        one pooled async client across calls and sessions. on_token is still
+        called on the caller's thread, with the latest partial response.
+        
+        Args:
+            user_request: User's natural language instruction
+            df_context: DataFrame metadata (columns, shape, preview)
+            conversation_history: Recent chat history for context
+            on_token: Optional callback receiving the partial response as it streams
+            
+        Returns:
+            dict: Structured command or insight response
+        """
+        updates: "queue.Queue[str]" = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self.agenerate_command(user_request, df_context, conversation_history, on_token=updates.put),
+            self._event_loop()
+        )
+        
+        while True:
+            try:
+                text = updates.get(timeout=0.05)
+            except queue.Empty:
+                if future.done():
+                    break
+                continue
+            # Only the newest partial text is worth rendering
+            while not updates.empty():
+                text = updates.get_nowait()
+            if on_token is not None:
+                on_token(text)
+        
+        return future.result()
+    
+    def _command_cache_key(self, user_request: str, df_context: dict,
+                           conversation_history: list = None) -> tuple:
+        """
+        Build the plan cache key from everything the command prompt quotes
+        
+        That is the request, the frame's schema, shape and preview rows, and
+        the (already capped) chat history lines. A hit therefore means the
+        model would have seen the same prompt; a new upload with the same
+        schema but different rows, or a follow-up after a different turn,
+        is planned afresh. Whitespace and trailing punctuation in the request
+        are normalized; case is kept since column names and values are
+        case-sensitive.
+        """
+        normalized = " ".join(user_request.split()).rstrip(".!?")
+        dtypes = df_context.get("dtypes", {})
+        history = tuple(self._history_lines(conversation_history)) if conversation_history else ()
+        return (
+            normalized,
+            tuple(df_context.get("columns", [])),
+            tuple(dtypes.items()) if isinstance(dtypes, dict) else (),
+            tuple(df_context.get("shape", ())),
+            str(df_context.get("preview", "")),
+            history
+        )
+    
+    def _get_cached_command(self, key: tuple):
+        """Return a copy of a cached plan, or None"""
+        with self._command_cache_lock:
+            if key not in self._command_cache:
+                return None
+            self._command_cache.move_to_end(key)
+            return copy.deepcopy(self._command_cache[key])
+    
+    def _store_command(self, key: tuple, command) -> None:
+        """Cache a plan unless it is an error or depends on the data's values"""
+        commands = command if isinstance(command, list) else [command]
+        for cmd in commands:
+            # Insights answer from the preview rows, errors are worth retrying
+            if not isinstance(cmd, dict) or cmd.get("action") in ("insight", "error") or "error" in cmd:
+                return
+        
+        with self._command_cache_lock:
+            self._command_cache[key] = copy.deepcopy(command)
+            self._command_cache.move_to_end(key)
+            if len(self._command_cache) > self.COMMAND_CACHE_SIZE:
+                self._command_cache.popitem(last=False)
+    
+    def _build_command_prompt(self, user_request: str, df_context: dict,
+                              conversation_history: list = None) -> Tuple[str, str]:
+        """Build the (prompt, system) pair for command generation"""
         # Format conversation history if provided
         history_context = ""
-        if conversation_history and len(conversation_history) > 0:
-            recent_history = conversation_history[-6:]
-            history_lines = []
-            for msg in recent_history:
-                role = "User" if msg["role"] == "user" else "Assistant"
-                content = msg["content"][:150]
-                history_lines.append(f"{role}: {content}")
-            
+        if conversation_history:
+            history_lines = self._history_lines(conversation_history)
             if history_lines:
                 history_context = f"""
 RECENT CONVERSATION:
@@ -245,17 +658,34 @@ USER REQUEST:
 
 Generate the JSON command or insight response:
 """
+        return prompt, _COMMAND_SYSTEM_PROMPT
+    
+    def _history_lines(self, conversation_history: list) -> List[str]:
+        """
+        Format the most recent chat messages as short prompt lines
         
-        response = self._call_api(prompt, system)
-        
-        # Parse JSON response
+        Walks back from the newest message, skipping the "Completed N/M" run
+        summaries, which repeat the step messages before them.
+        """
+        history_lines = []
+        for msg in reversed(conversation_history):
+            if msg.get("status") == "summary":
+                continue
+            role = "User" if msg["role"] == "user" else "Assistant"
+            history_lines.append(f"{role}: {msg['content'][:self.HISTORY_MESSAGE_CHARS]}")
+            if len(history_lines) == self.HISTORY_MESSAGES:
+                break
+        history_lines.reverse()
+        return history_lines
+    
+    def _parse_command_response(self, response: str):
+        """Parse the raw LLM response into a command dict or list of commands"""
         try:
             # Clean response (remove markdown if present)
             cleaned = response.strip()
-            if cleaned.startswith('```'):
-                cleaned = re.sub(r'^```json\s*', '', cleaned)
-                cleaned = re.sub(r'^```\s*', '', cleaned)
-                cleaned = re.sub(r'\s*```$', '', cleaned)
+            fenced = _FENCED_RE.fullmatch(cleaned)
+            if fenced:
+                cleaned = fenced.group(1)
             
             parsed = json.loads(cleaned)
             
@@ -283,14 +713,14 @@ Generate the JSON command or insight response:
             # Try to extract JSON from response
             try:
                 # Try to match array first
-                array_match = re.search(r'(\[.*\])', response, re.DOTALL)
+                array_match = _ARRAY_RE.search(response)
                 if array_match:
                     parsed = json.loads(array_match.group(1))
                     if isinstance(parsed, list) and len(parsed) > 0:
                         return parsed
                 
                 # Fall back to object match
-                match = re.search(r'(\{.*\})', response, re.DOTALL)
+                match = _OBJECT_RE.search(response)
                 if match:
                     parsed = json.loads(match.group(1))
                     return parsed
@@ -315,15 +745,6 @@ Generate the JSON command or insight response:
         Returns:
             str: Natural language answer
         """
-        system = """You are a data analyst assistant. Answer questions about DataFrames concisely and accurately.
-
-RULES:
-1. Base answers ONLY on provided context and statistics
-2. Be concise - 1-2 sentences
-3. Include specific numbers when available
-4. Don't hallucinate insights not in the data
-"""
-        
         stats_text = ""
         if df_stats:
             stats_text = f"\n\nSTATISTICS:\n{json.dumps(df_stats, indent=2, default=str)}"
@@ -340,4 +761,4 @@ QUESTION: {question}
 Answer concisely:
 """
         
-        return self._call_api(prompt, system)
\ No newline at end of file
+        return self._call_api(prompt, _INSIGHT_SYSTEM_PROMPT)
\ No newline at end of file
@@ -3,6 +3,7 @@ Aggregation operations for Sheet-Editor AI Agent
 Category 8: Aggregation and summary (returns insights, not modifications)
 """
 
+import numpy as np
 import pandas as pd
 from typing import List, Optional, Dict, Any
 
@@ -34,17 +35,8 @@ def group_aggregate(df: pd.DataFrame, group_by: List[str], agg_column: str,
     if agg_func not in valid_funcs:
         raise ValueError(f"Invalid function: {agg_func}. Use: {valid_funcs}")
     
-    # Perform aggregation
-    if agg_func == "sum":
-        result = df.groupby(group_by)[agg_column].sum()
-    elif agg_func == "mean":
-        result = df.groupby(group_by)[agg_column].mean()
-    elif agg_func == "count":
-        result = df.groupby(group_by)[agg_column].count()
-    elif agg_func == "min":
-        result = df.groupby(group_by)[agg_column].min()
-    elif agg_func == "max":
-        result = df.groupby(group_by)[agg_column].max()
+    # Perform aggregation (agg_func is whitelisted above)
+    result = getattr(df.groupby(group_by)[agg_column], agg_func)()
     
     # Format result as insight
     result_str = result.to_string()
@@ -135,19 +127,39 @@ def summary_stats(df: pd.DataFrame, column: str) -> Dict[str, Any]:
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
     
-    # Get statistics
     col_data = pd.to_numeric(df[column], errors='coerce')
     
-    stats = {
-        "Count": col_data.count(),
-        "Mean": col_data.mean(),
-        "Median": col_data.median(),
-        "Std Dev": col_data.std(),
-        "Min": col_data.min(),
-        "Max": col_data.max(),
-        "25%": col_data.quantile(0.25),
-        "75%": col_data.quantile(0.75)
-    }
+    if isinstance(col_data.dtype, pd.api.extensions.ExtensionDtype):
+        # Nullable columns keep pandas' reductions, so undefined stats stay
+        # <NA> and integral results of Int64 data stay integers
+        stats = {
+            "Count": col_data.count(),
+            "Mean": col_data.mean(),
+            "Median": col_data.median(),
+            "Std Dev": col_data.std(),
+            "Min": col_data.min(),
+            "Max": col_data.max(),
+            "25%": col_data.quantile(0.25),
+            "75%": col_data.quantile(0.75)
+        }
+    else:
+        # Drop missing values once, then reduce the plain array
+        values = col_data.dropna().to_numpy()
+        if values.size:
+            q25, median, q75 = np.quantile(values, [0.25, 0.5, 0.75])
+            stats = {
+                "Count": values.size,
+                "Mean": values.mean(),
+                "Median": median,
+                "Std Dev": values.std(ddof=1) if values.size > 1 else np.nan,
+                "Min": values.min(),
+                "Max": values.max(),
+                "25%": q25,
+                "75%": q75
+            }
+        else:
+            stats = dict.fromkeys(["Count", "Mean", "Median", "Std Dev", "Min", "Max", "25%", "75%"], np.nan)
+            stats["Count"] = 0
     
     # Format result
     result_str = "\n".join([f"- {k}: {v:.2f}" if isinstance(v, float) else f"- {k}: {v}" 
@@ -3,10 +3,23 @@ Cell/value operations for Sheet-Editor AI Agent
 Category 3: All cell-level value manipulations
 """
 
+import operator as _op
+import numpy as np
 import pandas as pd
 from typing import Any, Optional, Dict
 
 
+# Comparison operators accepted by replace_conditional
+_COMPARISONS = {
+    "==": _op.eq,
+    "!=": _op.ne,
+    "<": _op.lt,
+    ">": _op.gt,
+    "<=": _op.le,
+    ">=": _op.ge,
+}
+
+
 def replace_text(df: pd.DataFrame, column: str, old_value: str, new_value: str) -> pd.DataFrame:
     """
     Replace text globally in a column
@@ -23,7 +36,9 @@ def replace_text(df: pd.DataFrame, column: str, old_value: str, new_value: str)
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
     
-    df = df.copy()
+    # Shallow copy: columns are swapped out wholesale below, never written
+    # into, so the caller's frame and history snapshots stay untouched
+    df = df.copy(deep=False)
     df[column] = df[column].replace(old_value, new_value)
     return df
 
@@ -47,26 +62,15 @@ def replace_conditional(df: pd.DataFrame, column: str, condition: Dict[str, Any]
     operator = condition.get("operator")
     cond_value = condition.get("value")
     
-    df = df.copy()
-    
-    # Create mask
-    if operator == "==":
-        mask = df[column] == cond_value
-    elif operator == "!=":
-        mask = df[column] != cond_value
-    elif operator == "<":
-        mask = df[column] < cond_value
-    elif operator == ">":
-        mask = df[column] > cond_value
-    elif operator == "<=":
-        mask = df[column] <= cond_value
-    elif operator == ">=":
-        mask = df[column] >= cond_value
-    else:
+    compare = _COMPARISONS.get(operator)
+    if compare is None:
         raise ValueError(f"Unsupported operator: {operator}")
     
-    # Replace where mask is True
-    df.loc[mask, column] = new_value
+    df = df.copy(deep=False)
+    mask = compare(df[column], cond_value)
+    
+    # Replace where mask is True (a new column, not a write into the shared one)
+    df[column] = df[column].mask(mask, new_value)
     return df
 
 
@@ -85,7 +89,7 @@ def set_column_value(df: pd.DataFrame, column: str, value: Any) -> pd.DataFrame:
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
     
-    df = df.copy()
+    df = df.copy(deep=False)
     df[column] = value
     return df
 
@@ -105,7 +109,7 @@ def fill_na(df: pd.DataFrame, column: str, value: Any) -> pd.DataFrame:
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
     
-    df = df.copy()
+    df = df.copy(deep=False)
     df[column] = df[column].fillna(value)
     return df
 
@@ -121,7 +125,7 @@ def trim_whitespace(df: pd.DataFrame, column: Optional[str] = None) -> pd.DataFr
     Returns:
         Modified DataFrame
     """
-    df = df.copy()
+    df = df.copy(deep=False)
     
     if column:
         # Trim specific column
@@ -156,17 +160,48 @@ def change_case(df: pd.DataFrame, column: str, case_type: str) -> pd.DataFrame:
     if case_type not in ["upper", "lower", "title"]:
         raise ValueError(f"Invalid case_type: {case_type}")
     
-    df = df.copy()
-    
-    if case_type == "upper":
-        df[column] = df[column].astype(str).str.upper()
-    elif case_type == "lower":
-        df[column] = df[column].astype(str).str.lower()
-    elif case_type == "title":
-        df[column] = df[column].astype(str).str.title()
+    df = df.copy(deep=False)
+    values = df[column]
+    
+    if isinstance(values.dtype, pd.CategoricalDtype) and pd.api.types.infer_dtype(values.cat.categories) == "string":
+        # Change each category once and remap the codes; categories that
+        # collide after the change (e.g. "Bob" and "BOB") are merged
+        cased_codes, cased = pd.factorize(getattr(values.cat.categories.str, case_type)())
+        codes = values.cat.codes.to_numpy()
+        cased_values = pd.Categorical.from_codes(
+            np.where(codes >= 0, cased_codes[codes], -1), categories=cased, ordered=values.cat.ordered
+        )
+        df[column] = pd.Series(cased_values, index=df.index)
+        return df
+    
+    # Pure text columns go straight to .str; anything else is cast first so
+    # numbers and other non-strings are converted rather than nulled out
+    if pd.api.types.infer_dtype(values, skipna=True) != "string":
+        values = values.astype(str)
+    
+    df[column] = getattr(values.str, case_type)()
     return df
 
 
+def _letter_sequence(num_rows: int, first_letter: str) -> np.ndarray:
+    """
+    Build spreadsheet-style letter labels (A..Z, AA, AB, ...) for rows 0..num_rows-1
+    
+    Works one base-26 digit at a time over the whole array, so the Python
+    loop runs once per label length rather than once per row.
+    """
+    n = np.arange(num_rows)
+    labels = np.full(num_rows, "", dtype="<U1")
+    active = n >= 0
+    while active.any():
+        # Code points -> one-character strings (a <U1 view of uint32)
+        letters = (n % 26 + ord(first_letter)).astype(np.uint32).view("<U1")
+        labels = np.char.add(np.where(active, letters, ""), labels)
+        n = n // 26 - 1
+        active = n >= 0
+    return labels
+
+
 def assign_sequence(df: pd.DataFrame, column: str, sequence_type: str, start: int = 1) -> pd.DataFrame:
     """
     Assign sequential values to a column
@@ -191,33 +226,19 @@ def assign_sequence(df: pd.DataFrame, column: str, sequence_type: str, start: in
     if sequence_type not in ["number", "uppercase", "lowercase"]:
         raise ValueError(f"Invalid sequence_type: {sequence_type}. Must be 'number', 'uppercase', or 'lowercase'")
     
-    df = df.copy()
+    df = df.copy(deep=False)
     num_rows = len(df)
     
     if sequence_type == "number":
         # Generate numeric sequence
-        df[column] = range(start, start + num_rows)
+        df[column] = np.arange(start, start + num_rows)
     
     elif sequence_type == "uppercase":
         # Generate uppercase letter sequence (A, B, C, ..., Z, AA, AB, ...)
-        def num_to_uppercase(n):
-            result = ""
-            while n >= 0:
-                result = chr(65 + (n % 26)) + result
-                n = n // 26 - 1
-            return result
-        
-        df[column] = [num_to_uppercase(i) for i in range(num_rows)]
+        df[column] = _letter_sequence(num_rows, "A")
     
     elif sequence_type == "lowercase":
         # Generate lowercase letter sequence (a, b, c, ..., z, aa, ab, ...)
-        def num_to_lowercase(n):
-            result = ""
-            while n >= 0:
-                result = chr(97 + (n % 26)) + result
-                n = n // 26 - 1
-            return result
-        
-        df[column] = [num_to_lowercase(i) for i in range(num_rows)]
+        df[column] = _letter_sequence(num_rows, "a")
     
     return df
@@ -56,7 +56,9 @@ def add_constant_column(df: pd.DataFrame, column_name: str, value: Any) -> pd.Da
     if column_name in df.columns:
         raise ValueError(f"Column '{column_name}' already exists")
     
-    df = df.copy()
+    # Shallow copy: only whole columns are added or replaced below, so the
+    # caller's frame and history snapshots stay untouched
+    df = df.copy(deep=False)
     df[column_name] = value
     return df
 
@@ -75,7 +77,7 @@ def add_empty_column(df: pd.DataFrame, column_name: str) -> pd.DataFrame:
     if column_name in df.columns:
         raise ValueError(f"Column '{column_name}' already exists")
     
-    df = df.copy()
+    df = df.copy(deep=False)
     df[column_name] = pd.NA
     return df
 
@@ -91,14 +93,19 @@ def reorder_columns(df: pd.DataFrame, new_order: List[str]) -> pd.DataFrame:
     Returns:
         Reordered DataFrame
     """
-    # Validate all columns exist
+    # Validate all columns exist, once each, in a single pass
+    columns = set(df.columns)
+    seen = set()
     for col in new_order:
-        if col not in df.columns:
+        if col not in columns:
             raise ValueError(f"Column '{col}' not found")
+        if col in seen:
+            raise ValueError(f"Column '{col}' listed more than once")
+        seen.add(col)
     
     # Check if all columns are included
-    if set(new_order) != set(df.columns):
-        missing = set(df.columns) - set(new_order)
+    if len(seen) != len(columns):
+        missing = columns - seen
         raise ValueError(f"Missing columns in new order: {missing}")
     
     return df[new_order]
@@ -122,7 +129,7 @@ def duplicate_column(df: pd.DataFrame, source: str, target: str) -> pd.DataFrame
     if target in df.columns:
         raise ValueError(f"Target column '{target}' already exists")
     
-    df = df.copy()
+    df = df.copy(deep=False)
     df[target] = df[source]
     return df
 
@@ -141,6 +148,8 @@ def merge_columns(df: pd.DataFrame, columns: List[str], separator: str, target:
         Modified DataFrame
     """
     # Validate columns
+    if not columns:
+        raise ValueError("No columns to merge")
     for col in columns:
         if col not in df.columns:
             raise ValueError(f"Column '{col}' not found")
@@ -148,7 +157,8 @@ def merge_columns(df: pd.DataFrame, columns: List[str], separator: str, target:
     if target in df.columns:
         raise ValueError(f"Target column '{target}' already exists")
     
-    df = df.copy()
-    # Convert to string and merge
-    df[target] = df[columns].astype(str).agg(separator.join, axis=1)
+    df = df.copy(deep=False)
+    # Convert to string and concatenate column-wise (no per-row Python join)
+    parts = [df[col].astype(str) for col in columns]
+    df[target] = parts[0].str.cat(parts[1:], sep=separator)
     return df
@@ -3,8 +3,50 @@ Date/time operations for Sheet-Editor AI Agent
 Category 4: Date and time manipulations
 """
 
+import re
+import numpy as np
 import pandas as pd
-from typing import Optional
+from typing import List, Optional
+
+
+# strftime directives that are plain zero-padded numbers: (dt attribute, format spec)
+_NUMERIC_DIRECTIVES = {
+    "%Y": ("year", "04d"),
+    "%m": ("month", "02d"),
+    "%d": ("day", "02d"),
+    "%H": ("hour", "02d"),
+    "%M": ("minute", "02d"),
+    "%S": ("second", "02d"),
+}
+_DIRECTIVE_RE = re.compile(r"%.")
+# Formats pandas' own strftime already renders on a fast ISO path
+_ISO_FORMATS = {"%Y-%m-%d", "%Y-%m-%d %H:%M:%S"}
+
+
+def _format_dates(dates: pd.Series, fmt: str) -> pd.Series:
+    """
+    Format a datetime Series like .dt.strftime(fmt)
+    
+    Formats built only from numeric fields (e.g. "%m/%d/%Y") are rendered
+    from integer components with a str.format template, which is several
+    times faster than strftime's per-element formatting; anything else
+    (month names, weekdays, %%) uses strftime. Missing dates stay NaN.
+    """
+    directives = _DIRECTIVE_RE.findall(fmt)
+    if fmt in _ISO_FORMATS or not directives or any(d not in _NUMERIC_DIRECTIVES for d in directives):
+        return dates.dt.strftime(fmt)
+    
+    # e.g. "%m/%d/%Y" -> "{0:02d}/{1:02d}/{2:04d}"
+    literals = _DIRECTIVE_RE.split(fmt.replace("{", "{{").replace("}", "}}"))
+    template = literals[0]
+    for i, (directive, literal) in enumerate(zip(directives, literals[1:])):
+        template += f"{{{i}:{_NUMERIC_DIRECTIVES[directive][1]}}}" + literal
+    
+    present = dates[dates.notna()]
+    fields = [getattr(present.dt, _NUMERIC_DIRECTIVES[d][0]).tolist() for d in directives]
+    text = [template.format(*values) for values in zip(*fields)]
+    return pd.Series(text, index=present.index, dtype=object).reindex(dates.index)
+
 
 def reformat_date(df: pd.DataFrame, column: str, old_format: str, new_format: str) -> pd.DataFrame:
     """
@@ -22,9 +64,11 @@ def reformat_date(df: pd.DataFrame, column: str, old_format: str, new_format: st
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
     
-    df = df.copy()
+    # Shallow copy: columns are swapped out wholesale below, never written
+    # into, so the caller's frame and history snapshots stay untouched
+    df = df.copy(deep=False)
     # Parse with old format then format to new format
-    df[column] = pd.to_datetime(df[column], format=old_format).dt.strftime(new_format)
+    df[column] = _format_dates(pd.to_datetime(df[column], format=old_format), new_format)
     return df
 
 
@@ -38,25 +82,41 @@ def extract_date_part(df: pd.DataFrame, column: str, part: str, target_column: s
         part: "year", "month", or "day"
         target_column: Name of new column
     
+    Returns:
+        Modified DataFrame
+    """
+    return extract_date_parts(df, column, [part], [target_column])
+
+
+def extract_date_parts(df: pd.DataFrame, column: str, parts: List[str], target_columns: List[str]) -> pd.DataFrame:
+    """
+    Extract several parts of a date at once, parsing the column only once
+    
+    Args:
+        df: DataFrame
+        column: Source column
+        parts: Parts to extract, each "year", "month", or "day"
+        target_columns: Name of the new column for each part
+    
     Returns:
         Modified DataFrame
     """
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
     
-    if part not in ["year", "month", "day"]:
-        raise ValueError(f"Invalid part: {part}")
+    if len(parts) != len(target_columns):
+        raise ValueError(f"Expected {len(parts)} target columns, got {len(target_columns)}")
+    
+    for part in parts:
+        if part not in ["year", "month", "day"]:
+            raise ValueError(f"Invalid part: {part}")
     
-    df = df.copy()
+    df = df.copy(deep=False)
     # Convert to datetime first
-    dt = pd.to_datetime(df[column])
+    dt = pd.to_datetime(df[column]).dt
     
-    if part == "year":
-        df[target_column] = dt.dt.year
-    elif part == "month":
-        df[target_column] = dt.dt.month
-    elif part == "day":
-        df[target_column] = dt.dt.day
+    for part, target_column in zip(parts, target_columns):
+        df[target_column] = getattr(dt, part)
     
     return df
 
@@ -75,7 +135,7 @@ def convert_to_datetime(df: pd.DataFrame, column: str) -> pd.DataFrame:
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
     
-    df = df.copy()
+    df = df.copy(deep=False)
     df[column] = pd.to_datetime(df[column], errors='coerce')
     return df
 
@@ -100,14 +160,16 @@ def calculate_duration(df: pd.DataFrame, start_col: str, end_col: str,
     if end_col not in df.columns:
         raise ValueError(f"Column '{end_col}' not found")
     
-    df = df.copy()
+    df = df.copy(deep=False)
     start = pd.to_datetime(df[start_col])
     end = pd.to_datetime(df[end_col])
+    duration = end - start
     
     if unit == "days":
-        df[target_col] = (end - start).dt.days
+        df[target_col] = duration.dt.days
     elif unit == "hours":
-        df[target_col] = (end - start).dt.total_seconds() / 3600
+        # Divide the timedelta64 array directly (any resolution; NaT -> NaN)
+        df[target_col] = duration.to_numpy() / np.timedelta64(1, "h")
     else:
         raise ValueError(f"Unsupported unit: {unit}")
     
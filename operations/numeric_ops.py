@@ -3,6 +3,7 @@ Numeric transformation operations for Sheet-Editor AI Agent
 Category 5: Numeric manipulations and calculations
 """
 
+import numpy as np
 import pandas as pd
 
 def multiply_column(df: pd.DataFrame, column: str, factor: float) -> pd.DataFrame:
@@ -20,7 +21,9 @@ def multiply_column(df: pd.DataFrame, column: str, factor: float) -> pd.DataFram
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
     
-    df = df.copy()
+    # Shallow copy: columns are swapped out wholesale below, never written
+    # into, so the caller's frame and history snapshots stay untouched
+    df = df.copy(deep=False)
     df[column] = pd.to_numeric(df[column], errors='coerce') * factor
     return df
 
@@ -39,7 +42,7 @@ def add_to_column(df: pd.DataFrame, column: str, value: float) -> pd.DataFrame:
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
     
-    df = df.copy()
+    df = df.copy(deep=False)
     df[column] = pd.to_numeric(df[column], errors='coerce') + value
     return df
 
@@ -59,7 +62,7 @@ def round_column(df: pd.DataFrame, column: str, decimals: int) -> pd.DataFrame:
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
     
-    df = df.copy()
+    df = df.copy(deep=False)
     df[column] = pd.to_numeric(df[column], errors='coerce').round(decimals)
     return df
 
@@ -82,13 +85,15 @@ def normalize_column(df: pd.DataFrame, column: str, method: str = "minmax") -> p
     if method not in ["minmax", "zscore"]:
         raise ValueError(f"Invalid method: {method}")
     
-    df = df.copy()
+    df = df.copy(deep=False)
     values = pd.to_numeric(df[column], errors='coerce')
     
     if method == "minmax":
-        # Scale to [0, 1]
-        min_val = values.min()
-        max_val = values.max()
+        # Scale to [0, 1]; fmin/fmax reductions skip NaN on the raw array,
+        # far quicker than Series.min/max with their per-call NaN masks
+        arr = values.to_numpy(dtype=float, na_value=np.nan)
+        min_val = np.fmin.reduce(arr) if arr.size else np.nan
+        max_val = np.fmax.reduce(arr) if arr.size else np.nan
         if max_val > min_val:
             df[column] = (values - min_val) / (max_val - min_val)
         else:
@@ -122,10 +127,10 @@ def create_ratio(df: pd.DataFrame, numerator_col: str, denominator_col: str, tar
     if denominator_col not in df.columns:
         raise ValueError(f"Column '{denominator_col}' not found")
     
-    df = df.copy()
+    df = df.copy(deep=False)
     numerator = pd.to_numeric(df[numerator_col], errors='coerce')
     denominator = pd.to_numeric(df[denominator_col], errors='coerce')
     
-    # Avoid division by zero
-    df[target] = numerator / denominator.replace(0, pd.NA)
+    # Avoid division by zero (zero denominators become NaN, keeping a float column)
+    df[target] = numerator / denominator.where(denominator != 0)
     return df
@@ -3,9 +3,58 @@ Row operations for Sheet-Editor AI Agent
 Category 1: All row-level manipulations
 """
 
+import importlib.util
+import operator as _op
+import numpy as np
 import pandas as pd
 from typing import List, Any, Optional
 
+# Condition operators accepted by delete_rows_condition / keep_rows_condition
+_COMPARISONS = {
+    "==": _op.eq,
+    "!=": _op.ne,
+    "<": _op.lt,
+    ">": _op.gt,
+    "<=": _op.le,
+    ">=": _op.ge,
+}
+# Arrow-backed strings run contains/startswith/endswith in C++; optional
+# (pyarrow ships with streamlit) and falls back to object-dtype .str
+_MATCH_DTYPE = 'string[pyarrow]' if importlib.util.find_spec('pyarrow') else None
+_STRING_MATCHES = {
+    "contains": lambda text, value: text.str.contains(value, na=False, regex=False),
+    "startswith": lambda text, value: text.str.startswith(value, na=False),
+    "endswith": lambda text, value: text.str.endswith(value, na=False),
+}
+
+def _build_mask(df: pd.DataFrame, column: str, operator: str, value: Any) -> pd.Series:
+    """Boolean mask of rows where `column <operator> value` holds"""
+    if operator in _COMPARISONS:
+        return _COMPARISONS[operator](df[column], value)
+    
+    if operator in _STRING_MATCHES:
+        values = df[column]
+        # Text columns are matched as-is; others are compared by their string form
+        if pd.api.types.infer_dtype(values, skipna=True) != "string":
+            values = values.astype(str)
+        if _MATCH_DTYPE is not None:
+            # Only the boolean mask leaves this function, so the column keeps its dtype
+            values = values.astype(_MATCH_DTYPE)
+            return _STRING_MATCHES[operator](values, str(value)).fillna(False).astype(bool)
+        return _STRING_MATCHES[operator](values, str(value))
+    
+    raise ValueError(f"Unsupported operator: {operator}")
+
+def _renumber(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Give a frame just produced by drop/filtering a fresh 0..n-1 index
+    
+    Same result as reset_index(drop=True), but sets the index on the new
+    frame instead of copying it (reset_index copies without copy-on-write).
+    """
+    df.index = pd.RangeIndex(len(df))
+    return df
+
 def delete_row(df: pd.DataFrame, row_index: int) -> pd.DataFrame:
     """
     Delete row by index (1-indexed for user interface)
@@ -22,7 +71,7 @@ def delete_row(df: pd.DataFrame, row_index: int) -> pd.DataFrame:
     
     # Convert to 0-indexed
     actual_index = row_index - 1
-    return df.drop(df.index[actual_index]).reset_index(drop=True)
+    return _renumber(df.drop(df.index[actual_index]))
 
 def delete_rows(df: pd.DataFrame, row_indices: List[int]) -> pd.DataFrame:
     """
@@ -35,14 +84,17 @@ def delete_rows(df: pd.DataFrame, row_indices: List[int]) -> pd.DataFrame:
     Returns:
         Modified DataFrame
     """
-    # Validate indices
-    for idx in row_indices:
-        if idx < 1 or idx > len(df):
-            raise ValueError(f"Row index {idx} out of range (1-{len(df)})")
+    positions = np.fromiter((_op.index(idx) for idx in row_indices), dtype=np.intp, count=len(row_indices))
     
-    # Convert to 0-indexed
-    actual_indices = [df.index[i - 1] for i in row_indices]
-    return df.drop(actual_indices).reset_index(drop=True)
+    # Validate indices
+    out_of_range = positions[(positions < 1) | (positions > len(df))]
+    if out_of_range.size:
+        raise ValueError(f"Row index {out_of_range[0]} out of range (1-{len(df)})")
+    
+    # Keep every row not listed (positions are 1-indexed); no label lookups
+    keep = np.ones(len(df), dtype=bool)
+    keep[positions - 1] = False
+    return _renumber(df[keep])
 
 def delete_rows_condition(df: pd.DataFrame, column: str, operator: str, value: Any) -> pd.DataFrame:
     """
@@ -60,30 +112,10 @@ def delete_rows_condition(df: pd.DataFrame, column: str, operator: str, value: A
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
     
-    # Create mask based on operator
-    if operator == "==":
-        mask = df[column] == value
-    elif operator == "!=":
-        mask = df[column] != value
-    elif operator == "<":
-        mask = df[column] < value
-    elif operator == ">":
-        mask = df[column] > value
-    elif operator == "<=":
-        mask = df[column] <= value
-    elif operator == ">=":
-        mask = df[column] >= value
-    elif operator == "contains":
-        mask = df[column].astype(str).str.contains(str(value), na=False)
-    elif operator == "startswith":
-        mask = df[column].astype(str).str.startswith(str(value), na=False)
-    elif operator == "endswith":
-        mask = df[column].astype(str).str.endswith(str(value), na=False)
-    else:
-        raise ValueError(f"Unsupported operator: {operator}")
+    mask = _build_mask(df, column, operator, value)
     
     # Delete matching rows
-    return df[~mask].reset_index(drop=True)
+    return _renumber(df[~mask])
 
 def keep_rows_condition(df: pd.DataFrame, column: str, operator: str, value: Any) -> pd.DataFrame:
     """
@@ -101,30 +133,10 @@ def keep_rows_condition(df: pd.DataFrame, column: str, operator: str, value: Any
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
     
-    # Create mask (same as delete_rows_condition)
-    if operator == "==":
-        mask = df[column] == value
-    elif operator == "!=":
-        mask = df[column] != value
-    elif operator == "<":
-        mask = df[column] < value
-    elif operator == ">":
-        mask = df[column] > value
-    elif operator == "<=":
-        mask = df[column] <= value
-    elif operator == ">=":
-        mask = df[column] >= value
-    elif operator == "contains":
-        mask = df[column].astype(str).str.contains(str(value), na=False)
-    elif operator == "startswith":
-        mask = df[column].astype(str).str.startswith(str(value), na=False)
-    elif operator == "endswith":
-        mask = df[column].astype(str).str.endswith(str(value), na=False)
-    else:
-        raise ValueError(f"Unsupported operator: {operator}")
+    mask = _build_mask(df, column, operator, value)
     
     # Keep matching rows
-    return df[mask].reset_index(drop=True)
+    return _renumber(df[mask])
 
 def insert_row(df: pd.DataFrame, row_index: int, values: List[Any]) -> pd.DataFrame:
     """
@@ -169,7 +181,17 @@ def sort_rows(df: pd.DataFrame, column: str, ascending: bool = True) -> pd.DataF
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
     
-    return df.sort_values(by=column, ascending=ascending).reset_index(drop=True)
+    values = df[column]
+    
+    # Text columns sort much faster on integer codes than by comparing strings
+    if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) == "string":
+        codes, uniques = pd.factorize(values, sort=True)
+        if not ascending:
+            codes = np.where(codes >= 0, len(uniques) - 1 - codes, codes)
+        codes = np.where(codes < 0, len(uniques), codes)  # Missing values last
+        return _renumber(df.take(np.argsort(codes, kind='stable')))
+    
+    return df.sort_values(by=column, ascending=ascending, ignore_index=True)
 
 def remove_duplicates(df: pd.DataFrame, subset_columns: Optional[List[str]] = None) -> pd.DataFrame:
     """
@@ -188,4 +210,4 @@ def remove_duplicates(df: pd.DataFrame, subset_columns: Optional[List[str]] = No
             if col not in df.columns:
                 raise ValueError(f"Column '{col}' not found")
     
-    return df.drop_duplicates(subset=subset_columns, keep='first').reset_index(drop=True)
+    return df.drop_duplicates(subset=subset_columns, keep='first', ignore_index=True)
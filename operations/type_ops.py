@@ -22,16 +22,32 @@ def convert_type(df: pd.DataFrame, column: str, target_type: str) -> pd.DataFram
     if target_type not in ["int", "float", "str", "boolean"]:
         raise ValueError(f"Invalid target_type: {target_type}")
     
-    df = df.copy()
+    values = df[column]
+    
+    # Already in the target type: nothing to convert
+    if (
+        (target_type == "int" and values.dtype == "Int64")
+        or (target_type == "float" and pd.api.types.is_float_dtype(values))
+        or (target_type == "str" and values.dtype == object
+            and pd.api.types.infer_dtype(values, skipna=False) == "string")
+        or (target_type == "boolean" and values.dtype == bool)
+    ):
+        return df
+    
+    # Shallow copy: columns are swapped out wholesale below, never written
+    # into, so the caller's frame and history snapshots stay untouched
+    df = df.copy(deep=False)
     
     if target_type == "int":
-        df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int64')  # Nullable int
+        if not pd.api.types.is_integer_dtype(values):
+            values = pd.to_numeric(values, errors='coerce')
+        df[column] = values.astype('Int64')  # Nullable int
     elif target_type == "float":
-        df[column] = pd.to_numeric(df[column], errors='coerce')
+        df[column] = pd.to_numeric(values, errors='coerce')
     elif target_type == "str":
-        df[column] = df[column].astype(str)
+        df[column] = values.astype(str)
     elif target_type == "boolean":
         # Convert to boolean (0/False, 1/True)
-        df[column] = df[column].astype(bool)
+        df[column] = values.astype(bool)
     
     return df
@@ -3,61 +3,141 @@ Comprehensive Test Suite for Sheet-Editor AI Agent Operations
 Tests all implemented categories (1-7)
 """
 
+import gc
+import importlib.util
+import time
+import numpy as np
 import pandas as pd
 import pytest
-from operations import row_ops, column_ops, cell_ops, date_ops, numeric_ops, type_ops
+from operations import row_ops, column_ops, cell_ops, date_ops, numeric_ops, type_ops, aggregation_ops
+from executor import Executor
+from llm_helper import LLMHelper, _fast_path_command
+
+
+@pytest.fixture(scope="module")
+def revenue_df():
+    """Create a 64-row frame for exercising row filters"""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'Revenue': rng.integers(-100, 500, size=64)})
+
+
+@pytest.fixture(scope="module")
+def big_df():
+    """Create a 100k-row numeric frame for performance smoke tests"""
+    return pd.DataFrame({'A': np.arange(100_000, dtype=np.int64)})
+
+
+@pytest.fixture(scope="module")
+def shuffled_df():
+    """Create a 100k-row frame of shuffled integers for row performance smoke tests"""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'A': rng.permutation(100_000)})
+
+
+def _best_time(func, repeat=3):
+    """Return the fastest of a few wall-clock timings of func()"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+# ISO date strings shared by the date tests; wrapped without copying, since
+# the operations replace columns rather than writing into them
+_ISO_DATES = np.array(['2023-01-15', '2024-02-20'], dtype=object)
+
+
+def _date_df():
+    """Create a one-column DataFrame over the shared ISO dates"""
+    return pd.DataFrame({'Date': _ISO_DATES}, copy=False)
+
+
+@pytest.fixture(scope="module")
+def dt_df():
+    """Create a DataFrame over the shared dates, parsed once per module"""
+    return pd.DataFrame({'Date': pd.to_datetime(_ISO_DATES)})
+
+
+# Arrow-backed strings when pyarrow is available, else pandas' own string dtype
+_STRING_DTYPE = pd.StringDtype("pyarrow") if importlib.util.find_spec("pyarrow") else pd.StringDtype()
+
+
+# row_df after inserting Frank at row 2
+_EXPECTED_AFTER_INSERT = pd.DataFrame({
+    'ID': [1, 6, 2, 3, 4, 5],
+    'Name': ['Alice', 'Frank', 'Bob', 'Charlie', 'David', 'Eve'],
+    'Revenue': [100, 250, 200, -50, 300, 150]
+})
 
 
 class TestCategory1RowOperations:
     """Test Category 1: Row Operations (7 functions)"""
     
-    def setup_method(self):
-        """Create test DataFrame"""
-        self.df = pd.DataFrame({
-            'ID': [1, 2, 3, 4, 5],
-            'Name': ['Alice', 'Bob', 'Charlie', 'David', 'Eve'],
-            'Revenue': [100, 200, -50, 300, 150]
-        })
-    
-    def test_delete_row_valid(self):
+    def test_delete_row_valid(self, row_df):
         """Test deleting a single row"""
-        result = row_ops.delete_row(self.df, 3)  # Delete Charlie
-        assert len(result) == 4
-        assert 'Charlie' not in result['Name'].values
+        result = row_ops.delete_row(row_df, 3)  # Delete Charlie
+        expected = pd.DataFrame({
+            'ID': [1, 2, 4, 5],
+            'Name': ['Alice', 'Bob', 'David', 'Eve'],
+            'Revenue': [100, 200, 300, 150]
+        })
+        pd.testing.assert_frame_equal(result, expected)
     
-    def test_delete_row_invalid_index(self):
+    def test_delete_row_invalid_index(self, row_df):
         """Test deleting row with invalid index"""
         with pytest.raises(ValueError):
-            row_ops.delete_row(self.df, 10)
+            row_ops.delete_row(row_df, 10)
     
-    def test_delete_multiple_rows(self):
+    def test_delete_multiple_rows(self, row_df):
         """Test deleting multiple rows"""
-        result = row_ops.delete_rows(self.df, [1, 3, 5])
+        result = row_ops.delete_rows(row_df, [1, 3, 5])
         assert len(result) == 2
-        assert list(result['Name'].values) == ['Bob', 'David']
-    
-    def test_delete_rows_condition(self):
-        """Test conditional row deletion"""
-        result = row_ops.delete_rows_condition(self.df, 'Revenue', '<', 0)
-        assert len(result) == 4
-        assert -50 not in result['Revenue'].values
-    
-    def test_keep_rows_condition(self):
-        """Test keeping only matching rows"""
-        result = row_ops.keep_rows_condition(self.df, 'Revenue', '>', 100)
-        assert len(result) == 3
-        assert all(result['Revenue'] > 100)
-    
-    def test_insert_row(self):
+        assert np.array_equal(result['Name'].to_numpy(), np.array(['Bob', 'David'], dtype=object))
+    
+    @pytest.mark.parametrize("operator,compare", [
+        ('<', lambda col, v: col < v),
+        ('<=', lambda col, v: col <= v),
+        ('>', lambda col, v: col > v),
+        ('>=', lambda col, v: col >= v),
+        ('==', lambda col, v: col == v),
+        ('!=', lambda col, v: col != v),
+    ])
+    @pytest.mark.parametrize("keep", [True, False], ids=['keep', 'delete'])
+    def test_rows_condition(self, revenue_df, operator, compare, keep):
+        """Test conditional row keeping and deletion for every comparison operator"""
+        value = revenue_df['Revenue'].iloc[7]
+        mask = compare(revenue_df['Revenue'], value)
+        if keep:
+            result = row_ops.keep_rows_condition(revenue_df, 'Revenue', operator, value)
+        else:
+            result = row_ops.delete_rows_condition(revenue_df, 'Revenue', operator, value)
+            mask = ~mask
+        expected = revenue_df[mask].reset_index(drop=True)
+        pd.testing.assert_frame_equal(result, expected)
+    
+    def test_insert_row(self, row_df):
         """Test inserting a new row"""
-        result = row_ops.insert_row(self.df, 2, [6, 'Frank', 250])
-        assert len(result) == 6
-        assert result.iloc[1]['Name'] == 'Frank'
+        result = row_ops.insert_row(row_df, 2, [6, 'Frank', 250])
+        pd.testing.assert_frame_equal(result, _EXPECTED_AFTER_INSERT)
     
-    def test_sort_rows_ascending(self):
+    def test_sort_rows_ascending(self, row_df):
         """Test sorting rows"""
-        result = row_ops.sort_rows(self.df, 'Revenue', ascending=True)
-        assert list(result['Revenue'].values) == [-50, 100, 150, 200, 300]
+        result = row_ops.sort_rows(row_df, 'Revenue', ascending=True)
+        assert np.array_equal(result['Revenue'].to_numpy(), np.array([-50, 100, 150, 200, 300]))
+    
+    @pytest.mark.parametrize("operation,reference", [
+        (lambda df: row_ops.sort_rows(df, 'A'), lambda df: df.sort_values('A', ignore_index=True)),
+        (lambda df: row_ops.keep_rows_condition(df, 'A', '>', 500), lambda df: df[df['A'] > 500].reset_index(drop=True)),
+    ], ids=['sort', 'filter'])
+    @pytest.mark.slow
+    def test_row_ops_stay_vectorized(self, shuffled_df, operation, reference):
+        """Test row operations on 100k rows keep pace with the direct pandas call"""
+        # Both run at ~1x the direct call today; a Python-level sort or
+        # filter is 5x+ slower, well past the 3x allowance
+        reference_time = _best_time(lambda: reference(shuffled_df))
+        assert _best_time(lambda: operation(shuffled_df)) < reference_time * 3
     
     def test_remove_duplicates(self):
         """Test removing duplicate rows"""
@@ -66,51 +146,45 @@ class TestCategory1RowOperations:
             'B': [4, 5, 5, 6]
         })
         result = row_ops.remove_duplicates(df_dup)
-        assert len(result) == 3
+        # First occurrences survive in their original order
+        np.testing.assert_array_equal(result.to_numpy(), np.array([[1, 4], [2, 5], [3, 6]]))
 
 
 class TestCategory2ColumnOperations:
     """Test Category 2: Column Operations (7 functions)"""
     
-    def setup_method(self):
-        self.df = pd.DataFrame({
-            'First': [1, 2, 3],
-            'Second': [4, 5, 6],
-            'Third': [7, 8, 9]
-        })
-    
-    def test_delete_column(self):
+    def test_delete_column(self, col_df):
         """Test deleting a column"""
-        result = column_ops.delete_column(self.df, 'Second')
+        result = column_ops.delete_column(col_df, 'Second')
         assert 'Second' not in result.columns
         assert len(result.columns) == 2
     
-    def test_rename_column(self):
+    def test_rename_column(self, col_df):
         """Test renaming a column"""
-        result = column_ops.rename_column(self.df, 'First', 'FirstColumn')
+        result = column_ops.rename_column(col_df, 'First', 'FirstColumn')
         assert 'FirstColumn' in result.columns
         assert 'First' not in result.columns
     
-    def test_add_constant_column(self):
+    def test_add_constant_column(self, col_df):
         """Test adding column with constant value"""
-        result = column_ops.add_constant_column(self.df, 'Status', 'Active')
+        result = column_ops.add_constant_column(col_df, 'Status', 'Active')
         assert 'Status' in result.columns
-        assert all(result['Status'] == 'Active')
+        assert (result['Status'] == 'Active').all()
     
-    def test_add_empty_column(self):
+    def test_add_empty_column(self, col_df):
         """Test adding empty column"""
-        result = column_ops.add_empty_column(self.df, 'Notes')
+        result = column_ops.add_empty_column(col_df, 'Notes')
         assert 'Notes' in result.columns
         assert result['Notes'].isna().all()
     
-    def test_reorder_columns(self):
+    def test_reorder_columns(self, col_df):
         """Test reordering columns"""
-        result = column_ops.reorder_columns(self.df, ['Third', 'First', 'Second'])
+        result = column_ops.reorder_columns(col_df, ['Third', 'First', 'Second'])
         assert list(result.columns) == ['Third', 'First', 'Second']
     
-    def test_duplicate_column(self):
+    def test_duplicate_column(self, col_df):
         """Test duplicating a column"""
-        result = column_ops.duplicate_column(self.df, 'First', 'FirstCopy')
+        result = column_ops.duplicate_column(col_df, 'First', 'FirstCopy')
         assert 'FirstCopy' in result.columns
         assert list(result['First']) == list(result['FirstCopy'])
     
@@ -121,59 +195,72 @@ class TestCategory2ColumnOperations:
             'LastName': ['Doe', 'Smith']
         })
         result = column_ops.merge_columns(df, ['FirstName', 'LastName'], ' ', 'FullName')
-        assert 'FullName' in result.columns
-        assert result.iloc[0]['FullName'] == 'John Doe'
+        expected = pd.DataFrame({
+            'FirstName': ['John', 'Jane'],
+            'LastName': ['Doe', 'Smith'],
+            'FullName': ['John Doe', 'Jane Smith']
+        })
+        pd.testing.assert_frame_equal(result, expected)
 
 
 class TestCategory3CellOperations:
     """Test Category 3: Cell/Value Operations (6 functions)"""
     
-    def setup_method(self):
-        self.df = pd.DataFrame({
-            'Name': ['  Alice  ', 'BOB', 'charlie'],
-            'Value': [0, 10, None],
-            'Text': ['hello', 'world', 'test']
-        })
-    
     def test_replace_text(self):
         """Test global text replacement"""
         df = pd.DataFrame({'Col': ['A', 'B', 'A', 'C']})
         result = cell_ops.replace_text(df, 'Col', 'A', 'X')
-        assert list(result['Col']) == ['X', 'B', 'X', 'C']
+        assert np.array_equal(result['Col'].to_numpy(), np.array(['X', 'B', 'X', 'C'], dtype=object))
     
-    def test_replace_conditional(self):
+    def test_replace_conditional(self, cell_df):
         """Test conditional replacement"""
         result = cell_ops.replace_conditional(
-            self.df, 'Value', 
+            cell_df, 'Value', 
             {'operator': '==', 'value': 0}, 
             999
         )
         assert result.iloc[0]['Value'] == 999
     
-    def test_set_column_value(self):
+    def test_set_column_value(self, cell_df):
         """Test setting all column values"""
-        result = cell_ops.set_column_value(self.df, 'Value', 42)
-        assert all(result['Value'] == 42)
+        result = cell_ops.set_column_value(cell_df, 'Value', 42)
+        assert (result['Value'] == 42).all()
     
-    def test_fill_na(self):
+    def test_fill_na(self, cell_df):
         """Test filling NA values"""
-        result = cell_ops.fill_na(self.df, 'Value', 0)
+        result = cell_ops.fill_na(cell_df, 'Value', 0)
         assert not result['Value'].isna().any()
     
-    def test_trim_whitespace(self):
+    def test_trim_whitespace(self, cell_df):
         """Test trimming whitespace"""
-        result = cell_ops.trim_whitespace(self.df, 'Name')
-        assert result.iloc[0]['Name'] == 'Alice'
-    
-    def test_change_case_upper(self):
-        """Test changing case to upper"""
-        result = cell_ops.change_case(self.df, 'Name', 'upper')
-        assert all(result['Name'].str.isupper())
-    
-    def test_change_case_lower(self):
-        """Test changing case to lower"""
-        result = cell_ops.change_case(self.df, 'Name', 'lower')
-        assert result.iloc[1]['Name'] == '  bob  '
+        result = cell_ops.trim_whitespace(cell_df, 'Name')
+        pd.testing.assert_series_equal(result['Name'], pd.Series(['Alice', 'BOB', 'charlie'], name='Name'))
+    
+    @pytest.mark.parametrize("case_type,expected", [
+        ('upper', ['  ALICE  ', 'BOB', 'CHARLIE']),
+        ('lower', ['  alice  ', 'bob', 'charlie']),
+        ('title', ['  Alice  ', 'Bob', 'Charlie']),
+    ])
+    @pytest.mark.parametrize("dtype", [object, _STRING_DTYPE], ids=['object', 'string'])
+    def test_change_case(self, cell_df, case_type, expected, dtype):
+        """Test changing case on object and string-dtype columns"""
+        df = pd.DataFrame({'Name': cell_df['Name'].astype(dtype)})
+        result = cell_ops.change_case(df, 'Name', case_type)
+        pd.testing.assert_series_equal(result['Name'], pd.Series(expected, name='Name', dtype=dtype))
+    
+    def test_change_case_categorical(self):
+        """Test case changes on a categorical column merge colliding categories and keep missing values"""
+        df = pd.DataFrame({'Name': pd.Categorical(['Bob', 'BOB', None, 'ann'])})
+        result = cell_ops.change_case(df, 'Name', 'upper')
+        assert isinstance(result['Name'].dtype, pd.CategoricalDtype)
+        assert list(result['Name'].cat.categories) == ['BOB', 'ANN']
+        assert result['Name'].tolist()[:2] == ['BOB', 'BOB'] and pd.isna(result['Name'].iloc[2])
+    
+    def test_assign_sequence_letters(self):
+        """Test letter sequences roll over from Z to AA"""
+        df = pd.DataFrame({'Label': range(28)})
+        result = cell_ops.assign_sequence(df, 'Label', 'uppercase')
+        assert list(result['Label'][[0, 25, 26, 27]]) == ['A', 'Z', 'AA', 'AB']
 
 
 class TestCategory4DateOperations:
@@ -183,23 +270,34 @@ class TestCategory4DateOperations:
         """Test reformatting dates"""
         df = pd.DataFrame({'Date': ['15-01-2023', '20-02-2023']})
         result = date_ops.reformat_date(df, 'Date', '%d-%m-%Y', '%m/%d/%Y')
-        assert result.iloc[0]['Date'] == '01/15/2023'
-    
-    def test_extract_date_part_year(self):
-        """Test extracting year from date"""
-        df = pd.DataFrame({'Date': ['2023-01-15', '2024-02-20']})
-        result = date_ops.extract_date_part(df, 'Date', 'year', 'Year')
-        assert result.iloc[0]['Year'] == 2023
-    
-    def test_extract_date_part_month(self):
-        """Test extracting month from date"""
-        df = pd.DataFrame({'Date': ['2023-01-15', '2023-02-20']})
-        result = date_ops.extract_date_part(df, 'Date', 'month', 'Month')
-        assert result.iloc[0]['Month'] == 1
+        pd.testing.assert_frame_equal(result, pd.DataFrame({'Date': ['01/15/2023', '02/20/2023']}))
+    
+    def test_reformat_date_matches_strftime(self):
+        """Test numeric and named formats render like strftime, keeping missing dates"""
+        df = pd.DataFrame({'Date': ['2023-01-05 08:30', None, '2023-12-25 17:05']})
+        dates = pd.to_datetime(df['Date'], format='%Y-%m-%d %H:%M')
+        for new_format in ['%d.%m.%Y %H:%M', '%b %d, %Y']:
+            result = date_ops.reformat_date(df, 'Date', '%Y-%m-%d %H:%M', new_format)
+            pd.testing.assert_series_equal(result['Date'], dates.dt.strftime(new_format))
+    
+    @pytest.mark.parametrize("part,target,expected", [
+        ('year', 'Year', 2023),
+        ('month', 'Month', 1),
+    ])
+    def test_extract_date_part(self, dt_df, part, target, expected):
+        """Test extracting a single part from already-parsed dates"""
+        result = date_ops.extract_date_part(dt_df, 'Date', part, target)
+        assert result.iloc[0][target] == expected
+    
+    def test_extract_date_parts(self):
+        """Test extracting several parts in one call"""
+        df = _date_df()
+        result = date_ops.extract_date_parts(df, 'Date', ['year', 'day'], ['Year', 'Day'])
+        assert list(result.iloc[1][['Year', 'Day']]) == [2024, 20]
     
     def test_convert_to_datetime(self):
         """Test converting to datetime"""
-        df = pd.DataFrame({'Date': ['2023-01-15', '2023-02-20']})
+        df = _date_df()
         result = date_ops.convert_to_datetime(df, 'Date')
         assert pd.api.types.is_datetime64_any_dtype(result['Date'])
     
@@ -216,67 +314,75 @@ class TestCategory4DateOperations:
 class TestCategory5NumericOperations:
     """Test Category 5: Numeric Transformations (5 functions)"""
     
-    def setup_method(self):
-        self.df = pd.DataFrame({
-            'Value': [10.555, 20.444, 30.123],
-            'A': [1, 2, 3],
-            'B': [10, 20, 30]
-        })
-    
-    def test_multiply_column(self):
+    def test_multiply_column(self, numeric_df):
         """Test multiplying column"""
-        result = numeric_ops.multiply_column(self.df, 'A', 2)
-        assert list(result['A']) == [2, 4, 6]
+        result = numeric_ops.multiply_column(numeric_df, 'A', 2)
+        assert np.array_equal(result['A'].to_numpy(), np.array([2, 4, 6]))
     
-    def test_add_to_column(self):
+    def test_add_to_column(self, numeric_df):
         """Test adding to column"""
-        result = numeric_ops.add_to_column(self.df, 'A', 10)
-        assert list(result['A']) == [11, 12, 13]
+        result = numeric_ops.add_to_column(numeric_df, 'A', 10)
+        assert np.array_equal(result['A'].to_numpy(), np.array([11, 12, 13]))
     
-    def test_round_column(self):
+    def test_round_column(self, numeric_df):
         """Test rounding column"""
-        result = numeric_ops.round_column(self.df, 'Value', 2)
-        assert result.iloc[0]['Value'] == 10.56
+        result = numeric_ops.round_column(numeric_df, 'Value', 2)
+        np.testing.assert_allclose(result['Value'].to_numpy(), [10.56, 20.44, 30.12], atol=1e-9)
     
     def test_normalize_minmax(self):
         """Test min-max normalization"""
         df = pd.DataFrame({'Col': [0, 50, 100]})
         result = numeric_ops.normalize_column(df, 'Col', 'minmax')
-        assert result.iloc[0]['Col'] == 0.0
-        assert result.iloc[2]['Col'] == 1.0
+        np.testing.assert_allclose(result['Col'].to_numpy(), [0.0, 0.5, 1.0], atol=1e-9)
     
-    def test_create_ratio(self):
+    def test_create_ratio(self, numeric_df):
         """Test creating ratio column"""
-        result = numeric_ops.create_ratio(self.df, 'B', 'A', 'Ratio')
-        assert result.iloc[0]['Ratio'] == 10.0
+        result = numeric_ops.create_ratio(numeric_df, 'B', 'A', 'Ratio')
+        pd.testing.assert_series_equal(result['Ratio'], pd.Series([10.0, 10.0, 10.0], name='Ratio'))
+    
+    @pytest.mark.parametrize("operation,argument", [
+        (numeric_ops.multiply_column, 2),
+        (numeric_ops.add_to_column, 2),
+        (numeric_ops.round_column, 0),
+    ], ids=['multiply', 'add', 'round'])
+    @pytest.mark.slow
+    def test_numeric_ops_stay_vectorized(self, big_df, operation, argument):
+        """Test numeric operations on 100k rows run far faster than a per-element apply"""
+        # A row-by-row .apply is ~40x slower than the vectorized ops; the 4x
+        # margin keeps the check clear of timing noise
+        apply_time = _best_time(lambda: big_df['A'].apply(lambda x: x * 2), repeat=1)
+        assert _best_time(lambda: operation(big_df, 'A', argument)) < apply_time / 4
 
 
 class TestCategory7TypeConversions:
     """Test Category 7: Type Conversions (1 function, 4 types)"""
     
-    def test_convert_to_int(self):
-        """Test converting to integer"""
-        df = pd.DataFrame({'Col': ['1', '2', '3']})
-        result = type_ops.convert_type(df, 'Col', 'int')
-        assert pd.api.types.is_integer_dtype(result['Col'])
-    
-    def test_convert_to_float(self):
-        """Test converting to float"""
-        df = pd.DataFrame({'Col': ['1.5', '2.5', '3.5']})
-        result = type_ops.convert_type(df, 'Col', 'float')
-        assert pd.api.types.is_float_dtype(result['Col'])
-    
-    def test_convert_to_str(self):
-        """Test converting to string"""
-        df = pd.DataFrame({'Col': [1, 2, 3]})
-        result = type_ops.convert_type(df, 'Col', 'str')
-        assert result['Col'].dtype == 'object'
-    
-    def test_convert_to_boolean(self):
-        """Test converting to boolean"""
-        df = pd.DataFrame({'Col': [0, 1, 1]})
-        result = type_ops.convert_type(df, 'Col', 'boolean')
-        assert result['Col'].dtype == 'bool'
+    @pytest.mark.parametrize("data,target_type,check", [
+        (['1', '2', '3'], 'int', pd.api.types.is_integer_dtype),
+        (['1.5', '2.5', '3.5'], 'float', pd.api.types.is_float_dtype),
+        ([1, 2, 3], 'str', lambda col: col.dtype == 'object'),
+        ([0, 1, 1], 'boolean', lambda col: col.dtype == 'bool'),
+    ], ids=['int', 'float', 'str', 'boolean'])
+    def test_convert_type(self, data, target_type, check):
+        """Test converting to each supported type"""
+        result = type_ops.convert_type(pd.DataFrame({'Col': data}), 'Col', target_type)
+        assert check(result['Col'])
+
+
+class TestCategory8Aggregations:
+    """Test Category 8: Aggregations (insights only)"""
+    
+    def test_summary_stats_nullable_int_with_na(self):
+        """Test nullable integer columns keep integer results and report undefined stats as <NA>"""
+        df = pd.DataFrame({'Qty': pd.array([1, None], dtype='Int64')})
+        result = aggregation_ops.summary_stats(df, 'Qty')
+        stats = result['data']
+        
+        assert stats['Count'] == 1
+        assert stats['Std Dev'] is pd.NA
+        assert stats['Min'] == 1 and not isinstance(stats['Min'], float)
+        assert '- Std Dev: <NA>' in result['response']
+        assert '- 25%: 1\n' in result['response']
 
 
 # Integration tests
@@ -286,25 +392,24 @@ class TestIntegration:
     def test_multi_column_workflow(self):
         """Test realistic workflow: rename, add, merge"""
         df = pd.DataFrame({
-            'fname': ['John', 'Jane'],
-            'lname': ['Doe', 'Smith'],
+            'fname': pd.Categorical(['John', 'Jane']),
+            'lname': pd.Categorical(['Doe', 'Smith']),
             'rev': [100, 200]
         })
         
-        # Step 1: Rename columns
-        df = column_ops.rename_column(df, 'fname', 'FirstName')
-        df = column_ops.rename_column(df, 'lname', 'LastName')
-        df = column_ops.rename_column(df, 'rev', 'Revenue')
-        
-        # Step 2: Merge names
-        df = column_ops.merge_columns(df, ['FirstName', 'LastName'], ' ', 'FullName')
-        
-        # Step 3: Add Status
-        df = column_ops.add_constant_column(df, 'Status', 'Active')
+        df = (df
+              # Step 1: Rename columns
+              .pipe(column_ops.rename_column, 'fname', 'FirstName')
+              .pipe(column_ops.rename_column, 'lname', 'LastName')
+              .pipe(column_ops.rename_column, 'rev', 'Revenue')
+              # Step 2: Merge names
+              .pipe(column_ops.merge_columns, ['FirstName', 'LastName'], ' ', 'FullName')
+              # Step 3: Add Status
+              .pipe(column_ops.add_constant_column, 'Status', 'Active'))
         
         assert 'FullName' in df.columns
         assert df.iloc[0]['FullName'] == 'John Doe'
-        assert all(df['Status'] == 'Active')
+        assert (df['Status'] == 'Active').all()
     
     def test_data_cleaning_workflow(self):
         """Test cleaning workflow: trim, case, fill NA"""
@@ -325,5 +430,126 @@ class TestIntegration:
         assert df.iloc[0]['Name'] == 'Alice'
         assert df.iloc[1]['Value'] == 0
 
+
+class TestExecutorUndo:
+    """Test undo history kept by the Executor"""
+    
+    def test_undo_steps_back_one_operation(self):
+        """Test each undo restores the state before the latest operation"""
+        executor = Executor(pd.DataFrame({'A': [1, 2]}))
+        executor.execute({"action": "add_constant_column", "parameters": {"column_name": "B", "value": 1}})
+        executor.execute({"action": "add_constant_column", "parameters": {"column_name": "C", "value": 2}})
+        
+        assert executor.undo()
+        assert list(executor.df.columns) == ['A', 'B']
+        assert executor.undo()
+        assert list(executor.df.columns) == ['A']
+        assert not executor.undo()
+    
+    def test_aggregation_and_failure_leave_history_unchanged(self):
+        """Test read-only and failed commands add nothing to undo"""
+        executor = Executor(pd.DataFrame({'A': [1, 2]}))
+        executor.execute({"action": "add_constant_column", "parameters": {"column_name": "B", "value": 1}})
+        executor.execute({"action": "summary_stats", "parameters": {"column": "A"}})
+        result = executor.execute({"action": "delete_column", "parameters": {"column_name": "missing"}})
+        
+        assert result["status"] == "error"
+        assert list(executor.df.columns) == ['A', 'B']
+        assert executor.undo()
+        assert list(executor.df.columns) == ['A']
+
+
+
+class TestFastPathCommands:
+    """Test requests answered without an LLM call"""
+    
+    def setup_method(self):
+        """Create test DataFrame context"""
+        self.context = {'columns': ['Name', 'Order ID'], 'shape': (5, 2)}
+    
+    def test_simple_requests_build_commands(self):
+        """Test common one-step requests map straight to commands"""
+        assert _fast_path_command('Delete row 3.', self.context)['parameters'] == {'row_index': 3}
+        
+        command = _fast_path_command('rename column order id to ID', self.context)
+        assert command['parameters'] == {'old_name': 'Order ID', 'new_name': 'ID'}
+        
+        command = _fast_path_command('How many rows?', self.context)
+        assert command['action'] == 'insight'
+        assert '5 rows' in command['response']
+    
+    def test_unknown_or_compound_requests_defer_to_llm(self):
+        """Test anything not clearly matched falls through to the LLM"""
+        assert _fast_path_command('delete column Revenue', self.context) is None
+        assert _fast_path_command('rename Name to Order ID', self.context) is None
+        assert _fast_path_command('delete row 3 and sort by Name', self.context) is None
+
+
+@pytest.fixture
+def helper():
+    """Create an LLMHelper with a dummy key, closed after the test"""
+    llm = LLMHelper(api_key="test-key")
+    yield llm
+    llm.close()
+
+
+class TestCommandCache:
+    """Test the generated-plan cache kept by LLMHelper"""
+    
+    def test_different_histories_do_not_share_a_plan(self, helper, monkeypatch):
+        """Test a follow-up request is re-planned when the chat history differs"""
+        replies = iter([
+            '{"action": "multiply_column", "parameters": {"column": "Cost", "factor": 2}}',
+            '{"action": "add_to_column", "parameters": {"column": "Cost", "value": 5}}',
+        ])
+        monkeypatch.setattr(helper, "_call_api", lambda prompt, system="": next(replies))
+        context = {'columns': ['Price', 'Tax', 'Cost'], 'dtypes': {}, 'shape': (3, 3)}
+        
+        first = helper.generate_command('do the same for Cost', context,
+                                        [{'role': 'user', 'content': 'multiply Price by 2'}])
+        second = helper.generate_command('do the same for Cost', context,
+                                         [{'role': 'user', 'content': 'add 5 to Tax'}])
+        
+        assert first['action'] == 'multiply_column'
+        assert second['action'] == 'add_to_column'
+    
+    def test_same_schema_different_rows_do_not_share_a_plan(self, helper, monkeypatch):
+        """Test a new upload with the same schema and shape is re-planned"""
+        replies = iter([
+            '{"action": "delete_row", "parameters": {"row_index": 1}}',
+            '{"action": "delete_row", "parameters": {"row_index": 2}}',
+        ])
+        monkeypatch.setattr(helper, "_call_api", lambda prompt, system="": next(replies))
+        context = {'columns': ['Name'], 'dtypes': {'Name': 'object'}, 'shape': (2, 1)}
+        
+        first = helper.generate_command('delete the row for Bob', {**context, 'preview': '[{"Name":"Bob"},{"Name":"Ann"}]'})
+        second = helper.generate_command('delete the row for Bob', {**context, 'preview': '[{"Name":"Ann"},{"Name":"Bob"}]'})
+        repeat = helper.generate_command('delete the row for Bob', {**context, 'preview': '[{"Name":"Ann"},{"Name":"Bob"}]'})
+        
+        assert first['parameters'] == {'row_index': 1}
+        assert second['parameters'] == repeat['parameters'] == {'row_index': 2}
+
+
+
+class TestHelperLifecycle:
+    """Test LLMHelper background resources"""
+    
+    def test_helpers_share_one_loop_and_release_dropped_clients(self):
+        """Test helpers reuse one event loop and a helper dropped without close() frees its client"""
+        first, second = LLMHelper(api_key="key-1"), LLMHelper(api_key="key-2")
+        assert first._event_loop() is second._event_loop()
+        
+        async_client = second._shared_async_client()
+        second.client.close()
+        del second
+        gc.collect()
+        
+        deadline = time.monotonic() + 5
+        while not async_client.is_closed() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert async_client.is_closed()
+        first.close()
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])